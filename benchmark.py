@@ -0,0 +1,45 @@
+"""
+Timings for saving trails, comparing `serialize` with the direct `dump` encoder.
+
+`python benchmark.py` times a generated trail, `python benchmark.py stores/basic.json` a stored one.
+"""
+import argparse
+import io
+import timeit
+
+from serialize import dump, load, serialize
+from tests.fixtures import generate_trail
+from trail import Trail
+
+
+def time_saving(trail: Trail, repeat: int) -> tuple[float, float]:
+    """Returns the best time over `repeat` runs for serialize and dump."""
+    def run_serialize():
+        io.StringIO().write(serialize(trail))
+
+    def run_dump():
+        dump(trail, io.StringIO())
+
+    serialize_time = min(timeit.repeat(run_serialize, number=1, repeat=repeat))
+    dump_time = min(timeit.repeat(run_dump, number=1, repeat=repeat))
+    return serialize_time, dump_time
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Compare serialize and dump.")
+    p.add_argument("store", help="A JSON trail store to save. Leave blank for generated trails.", nargs="?")
+    p.add_argument("-r", "--repeat", help="Runs per measurement.", type=int, default=5)
+    args = p.parse_args()
+
+    if args.store:
+        with open(args.store, "r") as f:
+            trails = [(args.store, load(f))]
+    else:
+        trails = [(f"{size} mountains", generate_trail(size)) for size in (1_000, 10_000, 100_000)]
+
+    for name, trail in trails:
+        buffer = io.StringIO()
+        dump(trail, buffer)
+        assert buffer.getvalue() == serialize(trail), "dump and serialize disagree"
+        serialize_time, dump_time = time_saving(trail, args.repeat)
+        print(f"{name}: serialize {serialize_time * 1000:.1f}ms, dump {dump_time * 1000:.1f}ms ({serialize_time / dump_time:.1f}x)")
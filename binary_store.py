@@ -0,0 +1,338 @@
+"""
+Compact binary trail store, read through mmap.
+
+Layout (all integers little endian, 4 bytes):
+    - Header: magic, format version, and the counts below.
+    - Node table: one (kind, a, b, c) record per trail node. Node 0 is the root.
+        - EMPTY:  a, b, c are -1.
+        - SERIES: a is the mountain record, c the following node, b is -1.
+        - SPLIT:  a, b, c are the top, bottom and follow nodes.
+    - Mountain table: one (name string, difficulty_level, length) record per distinct mountain.
+    - String table: string_count + 1 end offsets into the UTF-8 blob that follows, starting with 0.
+
+JSON stays the default format, use `convert_json_to_binary` (or run this file) to make binary stores.
+
+`open_binary` is the main way to read a binary store: it returns a `LazyTrail`, which reads each
+node from the mapped file the first time it is visited. Opening is O(1) whatever the size, and a walk
+only pays for the nodes it reaches. `load_binary` builds the whole trail up front in O(N),
+for when every node will be used, or the trail must outlive the file. Every node still becomes
+a Python object then, which costs the same whatever the format.
+"""
+from __future__ import annotations
+from array import array
+import argparse
+import gc
+import mmap
+import struct
+import sys
+
+from compiled_trail import CompiledTrail
+from mountain import Mountain
+from serialize import load_file
+from trail import Trail, TrailSeries, TrailSplit, TrailStore
+import trail_diff
+
+EXTENSION = ".trlb"
+
+MAGIC = b"TRLB"
+VERSION = 1
+
+# magic, version, flags, node_count, mountain_count, string_count, blob_size, reserved x2
+_HEADER = struct.Struct("<4sHHIIIIII")
+_NODE_FIELDS = 4
+_MOUNTAIN_FIELDS = 3
+
+EMPTY = CompiledTrail.EMPTY
+SERIES = CompiledTrail.SERIES
+SPLIT = CompiledTrail.SPLIT
+
+
+def dump_binary(trail: Trail, fp, deduplicate: bool = False) -> None:
+    """
+    Writes the trail to a binary file object in the format above.
+    Shared subtrails and repeated mountains or names are only written once.
+    With `deduplicate`, identical subtrails are shared first, so they are written once too
+    (and read back as one shared subtrail).
+
+    :complexity: O(N) where N is the number of trail nodes.
+    """
+    if deduplicate:
+        trail = trail_diff.deduplicate(trail)
+    compiled = CompiledTrail(trail)
+
+    strings: dict[str, int] = {}
+    records: dict[tuple[int, int, int], int] = {}
+    mountain_table = array("i")
+    for mountain in compiled.mountains:
+        name = strings.setdefault(mountain.name, len(strings))
+        key = (name, mountain.difficulty_level, mountain.length)
+        if key not in records:
+            records[key] = len(records)
+            mountain_table.extend(key)
+    # Which record each of the compiled mountains ended up as.
+    mountain_record = [
+        records[(strings[mountain.name], mountain.difficulty_level, mountain.length)]
+        for mountain in compiled.mountains
+    ]
+
+    node_table = array("i")
+    for i in range(len(compiled)):
+        if compiled.kind[i] == SERIES:
+            node_table.extend((SERIES, mountain_record[compiled.mountain[i]], -1, compiled.follow[i]))
+        else:
+            node_table.extend((compiled.kind[i], compiled.top[i], compiled.bottom[i], compiled.follow[i]))
+
+    encoded = [name.encode("utf-8") for name in strings]
+    offsets = array("I", [0])
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+
+    if sys.byteorder != "little":
+        for table in (node_table, mountain_table, offsets):
+            table.byteswap()
+    fp.write(_HEADER.pack(MAGIC, VERSION, 0, len(compiled), len(records), len(strings), offsets[-1], 0, 0))
+    fp.write(node_table.tobytes())
+    fp.write(mountain_table.tobytes())
+    fp.write(offsets.tobytes())
+    fp.write(b"".join(encoded))
+
+
+class BinaryTrailStore:
+    """
+    Read only view of a binary trail file.
+
+    The file is mapped into memory and its tables are read in place,
+    so opening a store costs O(1) no matter how large the file is.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open and map the given binary store.
+
+        :raises ValueError: when the file is not a binary trail store this version can read.
+        """
+        # The map keeps the file open by itself, for as long as it is in use.
+        with open(path, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{path} is empty, not a binary trail store")
+        if len(self.map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a binary trail store")
+        magic, version, _, self.node_count, self.mountain_count, self.string_count, blob_size, _, _ = _HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} binary trail store")
+
+        view = memoryview(self.map)
+        start = _HEADER.size
+        nodes_end = start + 4 * _NODE_FIELDS * self.node_count
+        mountains_end = nodes_end + 4 * _MOUNTAIN_FIELDS * self.mountain_count
+        offsets_end = mountains_end + 4 * (self.string_count + 1)
+        if offsets_end + blob_size > len(self.map):
+            view.release()
+            self.close()
+            raise ValueError(f"{path} is truncated")
+        self.nodes = self._table(view[start:nodes_end], "i")
+        self.mountains = self._table(view[nodes_end:mountains_end], "i")
+        self.offsets = self._table(view[mountains_end:offsets_end], "I")
+        self.blob = view[offsets_end:offsets_end + blob_size]
+        self.view = view
+        self.lazy_trails: dict[int, LazyTrail] = {}
+
+    @staticmethod
+    def _table(view: memoryview, typecode: str):
+        """Reads a table of 4 byte integers in place, or copies it if this machine is big endian."""
+        if sys.byteorder == "little":
+            return view.cast(typecode)
+        table = array(typecode, view.tobytes())
+        table.byteswap()
+        return table
+
+    def __len__(self) -> int:
+        """Returns the number of trail nodes in the store."""
+        return self.node_count
+
+    def node(self, index: int) -> tuple[int, int, int, int]:
+        """Returns the (kind, a, b, c) record of a node, see the module docstring."""
+        start = index * _NODE_FIELDS
+        return self.nodes[start], self.nodes[start + 1], self.nodes[start + 2], self.nodes[start + 3]
+
+    def string(self, index: int) -> str:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def mountain(self, record: int) -> Mountain:
+        """Makes a new Mountain from a mountain record."""
+        start = record * _MOUNTAIN_FIELDS
+        return Mountain(self.string(self.mountains[start]), self.mountains[start + 1], self.mountains[start + 2])
+
+    def lazy_trail(self, index: int = 0) -> LazyTrail:
+        """
+        Returns the trail at the given node (the root by default), read from the file as it is used.
+        It can only be read while the store is open.
+
+        :complexity: O(1)
+        """
+        trail = self.lazy_trails.get(index)
+        if trail is None:
+            trail = self.lazy_trails[index] = LazyTrail(self, index)
+        return trail
+
+    def to_trail(self) -> Trail:
+        """
+        Builds the whole trail. Every series gets its own Mountain object, as with `deserialize`.
+
+        :complexity: O(N) where N is the number of trail nodes.
+        """
+        # Nothing built here can be part of a reference cycle, so the cyclic garbage collector
+        # would only scan the growing trail again and again (most of the time taken, otherwise).
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._build()
+        finally:
+            if enabled:
+                gc.enable()
+
+    def _build(self) -> Trail:
+        nodes = self.nodes
+        names: dict[int, str] = {}
+        trails: list[Trail | None] = [None] * self.node_count
+        # Children are written after their parents, unless they are shared with an earlier
+        # parent, so building from the back nearly always finds the children ready.
+        for index in range(self.node_count - 1, -1, -1):
+            start = index * _NODE_FIELDS
+            kind, a, b, c = nodes[start], nodes[start + 1], nodes[start + 2], nodes[start + 3]
+            if kind == SERIES:
+                if trails[c] is None:
+                    self._build_from(index, trails)
+                    continue
+                record = a * _MOUNTAIN_FIELDS
+                name = self.mountains[record]
+                if name not in names:
+                    names[name] = self.string(name)
+                trails[index] = Trail(TrailSeries(
+                    Mountain(names[name], self.mountains[record + 1], self.mountains[record + 2]),
+                    trails[c],
+                ))
+            elif kind == SPLIT:
+                if trails[a] is None or trails[b] is None or trails[c] is None:
+                    self._build_from(index, trails)
+                    continue
+                trails[index] = Trail(TrailSplit(trails[a], trails[b], trails[c]))
+            else:
+                trails[index] = Trail(None)
+        return trails[0]
+
+    def _build_from(self, root: int, trails: list[Trail | None]) -> None:
+        """Builds the given node and anything under it that isn't built yet, with an explicit stack."""
+        stack = [root]
+        while stack:
+            index = stack[-1]
+            if trails[index] is not None:
+                stack.pop()
+                continue
+            kind, a, b, c = self.node(index)
+            if kind == SERIES:
+                children = (c,)
+            elif kind == SPLIT:
+                children = (a, b, c)
+            else:
+                children = ()
+            missing = [child for child in children if trails[child] is None]
+            if missing:
+                stack.extend(missing)
+                continue
+            if kind == SERIES:
+                trails[index] = Trail(TrailSeries(self.mountain(a), trails[c]))
+            elif kind == SPLIT:
+                trails[index] = Trail(TrailSplit(trails[a], trails[b], trails[c]))
+            else:
+                trails[index] = Trail(None)
+            stack.pop()
+
+    def close(self) -> None:
+        """Unmaps and closes the file. Nothing read from the tables may be used afterwards."""
+        for name in ("nodes", "mountains", "offsets", "blob", "view"):
+            table = self.__dict__.pop(name, None)
+            if isinstance(table, memoryview):
+                table.release()
+        self.map.close()
+
+    def __enter__(self) -> BinaryTrailStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class LazyTrail(Trail):
+    """
+    A Trail whose store is read from a binary store the first time it is used.
+
+    The subtrails in that store are LazyTrails too, so walking the trail only reads
+    (and keeps in memory) the nodes it visits. It can be used and edited like any
+    other Trail.
+    """
+
+    def __init__(self, source: BinaryTrailStore, index: int) -> None:
+        # Trail.__init__ would set the store straight away.
+        self.source = source
+        self.index = index
+        self.resolved = False
+        self._store: TrailStore = None
+
+    @property
+    def store(self) -> TrailStore:
+        if not self.resolved:
+            kind, a, b, c = self.source.node(self.index)
+            if kind == SERIES:
+                self._store = TrailSeries(self.source.mountain(a), self.source.lazy_trail(c))
+            elif kind == SPLIT:
+                self._store = TrailSplit(self.source.lazy_trail(a), self.source.lazy_trail(b), self.source.lazy_trail(c))
+            self.resolved = True
+        return self._store
+
+    @store.setter
+    def store(self, store: TrailStore) -> None:
+        self._store = store
+        self.resolved = True
+
+    def __repr__(self) -> str:
+        if not self.resolved:
+            return f"LazyTrail(<node {self.index}>)"
+        return f"LazyTrail(store={self._store!r})"
+
+
+def open_binary(path: str) -> LazyTrail:
+    """
+    Opens a binary store, returning its root trail, which reads the store as it is used.
+    Costs O(1) whatever the size of the store. The file stays mapped while the trail,
+    or anything read from it, is in use.
+
+    :raises ValueError: when the file is not a binary trail store this version can read.
+    """
+    return BinaryTrailStore(path).lazy_trail()
+
+
+def load_binary(path: str) -> Trail:
+    """Reads a whole trail from a binary store, see `open_binary` for reading only what is used."""
+    with BinaryTrailStore(path) as store:
+        return store.to_trail()
+
+
+def convert_json_to_binary(json_path: str, binary_path: str, deduplicate: bool = False) -> None:
+    """Converts a JSON trail store into a binary one, see `dump_binary`."""
+    trail = load_file(json_path)
+    with open(binary_path, "wb") as f:
+        dump_binary(trail, f, deduplicate)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Convert a JSON trail store into a binary one.")
+    p.add_argument("source", help="The JSON store to read, such as stores/basic.json")
+    p.add_argument("target", help=f"The binary store to write, such as stores/basic{EXTENSION}")
+    p.add_argument("-d", "--deduplicate", help="Write identical subtrails only once.", action="store_true")
+    args = p.parse_args()
+    convert_json_to_binary(args.source, args.target, args.deduplicate)
@@ -0,0 +1,186 @@
+"""
+Columnar export of trails and mountains, for loading into analysis tools.
+
+Each column is one array, filled in a single pass without building a record per row:
+    - Mountain columns: name (an index into `names`), difficulty_level and length.
+    - Node columns, one row per trail node (numbered as in CompiledTrail, 0 is the root):
+        kind (CompiledTrail.EMPTY / SERIES / SPLIT), parent node, branch (how the node
+        hangs off its parent, see below) and mountain (a mountain row, or -1).
+
+Columns are written as CSV tables, or as one .npy file per column, which numpy.load reads without numpy being needed here.
+"""
+from __future__ import annotations
+from array import array
+import argparse
+import csv
+import os
+import struct
+import sys
+from typing import Iterable, Sequence
+
+from compiled_trail import CompiledTrail
+from mountain import Mountain
+from serialize import load_file
+from trail import Trail
+
+# Values of the branch column.
+ROOT = -1
+FOLLOWING = 0
+TOP = 1
+BOTTOM = 2
+FOLLOW = 3
+
+MOUNTAIN_COLUMNS = ("name", "difficulty_level", "length")
+NODE_COLUMNS = ("kind", "parent", "branch", "mountain")
+
+
+class TrailColumns:
+    """Mountains, and optionally the trail holding them, as columns."""
+
+    def __init__(self) -> None:
+        self.names: list[str] = []
+        self.name_index: dict[str, int] = {}
+        self.name = array("i")
+        self.difficulty_level = array("i")
+        self.length = array("i")
+        self.kind = array("b")
+        self.parent = array("i")
+        self.branch = array("b")
+        self.mountain = array("i")
+
+    @classmethod
+    def from_mountains(cls, mountains: Iterable[Mountain]) -> TrailColumns:
+        """
+        Makes mountain columns (and no node columns), such as for `MountainManager.mountains`.
+
+        :complexity: O(M) where M is the number of mountains.
+        """
+        columns = cls()
+        for mountain in mountains:
+            columns.add_mountain(mountain)
+        return columns
+
+    @classmethod
+    def from_trail(cls, trail: Trail) -> TrailColumns:
+        """
+        Makes mountain and node columns for a trail, with one mountain row per series.
+        A subtrail shared by several parents is one node, whose parent is the first one found.
+
+        :complexity: O(N) where N is the number of trail nodes.
+        """
+        compiled = CompiledTrail(trail)
+        columns = cls()
+        count = len(compiled)
+        columns.kind = array("b", compiled.kind)
+        columns.parent = array("i", [-1]) * count
+        columns.branch = array("b", [ROOT]) * count
+        columns.mountain = array("i", [-1]) * count
+        for mountain in compiled.mountains:
+            columns.add_mountain(mountain)
+
+        parent = columns.parent
+        branch = columns.branch
+        for node in range(count):
+            # Mountains were compiled in node order, so the mountain column is the same.
+            if compiled.kind[node] == CompiledTrail.SERIES:
+                columns.mountain[node] = compiled.mountain[node]
+            for child, slot in (
+                (compiled.top[node], TOP),
+                (compiled.bottom[node], BOTTOM),
+                (compiled.follow[node], FOLLOWING if compiled.kind[node] == CompiledTrail.SERIES else FOLLOW),
+            ):
+                if child > 0 and branch[child] == ROOT:
+                    parent[child] = node
+                    branch[child] = slot
+        return columns
+
+    def add_mountain(self, mountain: Mountain) -> int:
+        """Adds a mountain row, and returns its index."""
+        name = self.name_index.get(mountain.name)
+        if name is None:
+            name = self.name_index[mountain.name] = len(self.names)
+            self.names.append(mountain.name)
+        self.name.append(name)
+        self.difficulty_level.append(mountain.difficulty_level)
+        self.length.append(mountain.length)
+        return len(self.name) - 1
+
+    def write_csv(self, directory: str) -> list[str]:
+        """
+        Writes mountains.csv, with the names written out, and nodes.csv if there are nodes.
+        Returns the paths written.
+        """
+        paths = [os.path.join(directory, "mountains.csv")]
+        names = self.names
+        write_csv(paths[0], MOUNTAIN_COLUMNS, [(names[i] for i in self.name), self.difficulty_level, self.length])
+        if self.kind:
+            paths.append(os.path.join(directory, "nodes.csv"))
+            write_csv(paths[1], NODE_COLUMNS, [getattr(self, column) for column in NODE_COLUMNS])
+        return paths
+
+    def write_npy(self, directory: str) -> list[str]:
+        """
+        Writes names.npy and one mountains.<column>.npy or nodes.<column>.npy file per column.
+        Returns the paths written.
+        """
+        paths = []
+        path = os.path.join(directory, "names.npy")
+        with open(path, "wb") as f:
+            write_npy_strings(self.names, f)
+        paths.append(path)
+        tables = [("mountains", MOUNTAIN_COLUMNS)]
+        if self.kind:
+            tables.append(("nodes", NODE_COLUMNS))
+        for table, names in tables:
+            for column in names:
+                path = os.path.join(directory, f"{table}.{column}.npy")
+                with open(path, "wb") as f:
+                    write_npy(getattr(self, column), f)
+                paths.append(path)
+        return paths
+
+
+def write_csv(path: str, header: Sequence[str], columns: Sequence[Iterable]) -> None:
+    """Writes equally long columns as a CSV table, a row at a time."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+
+
+def _write_npy_header(fp, descr: str, length: int) -> None:
+    """Writes a version 1.0 .npy header for a one dimensional array."""
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({length},), }}"
+    # The header (with the 10 bytes before it) is padded to a multiple of 64 bytes, ending in a newline.
+    header += " " * (-(10 + len(header) + 1) % 64) + "\n"
+    fp.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+def write_npy(values: array, fp) -> None:
+    """Writes an integer array to a binary file object in .npy format."""
+    kind = "u" if values.typecode.isupper() else "i"
+    _write_npy_header(fp, f"|{kind}1" if values.itemsize == 1 else f"<{kind}{values.itemsize}", len(values))
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    fp.write(values.tobytes())
+
+
+def write_npy_strings(strings: Sequence[str], fp) -> None:
+    """Writes strings to a binary file object in .npy format, as fixed width unicode."""
+    width = max((len(string) for string in strings), default=1) or 1
+    _write_npy_header(fp, f"<U{width}", len(strings))
+    for string in strings:
+        fp.write(string.ljust(width, "\0").encode("utf-32-le"))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Export a trail store as columns.")
+    p.add_argument("store", help="The store to export, such as stores/basic.json")
+    p.add_argument("directory", help="Where to write the columns.")
+    p.add_argument("-f", "--format", help="File format.", choices=["csv", "npy"], default="csv")
+    args = p.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    columns = TrailColumns.from_trail(load_file(args.store))
+    for path in columns.write_csv(args.directory) if args.format == "csv" else columns.write_npy(args.directory):
+        print(path)
@@ -0,0 +1,154 @@
+"""
+Flat, array backed form of a Trail for walking the same trail many times.
+
+Compiling a trail costs one pass over it. After that, every walk only
+follows integer indices, instead of checking store types and allocating
+stack nodes at each step.
+"""
+from __future__ import annotations
+from array import array
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit
+
+from typing import TYPE_CHECKING
+
+# Avoid circular imports for typing.
+if TYPE_CHECKING:
+    from personality import WalkerPersonality
+
+
+class CompiledTrail:
+    """
+    A snapshot of a trail, with one entry per trail node.
+
+    For node i:
+        - kind[i] is one of EMPTY, SERIES or SPLIT.
+        - mountain[i] indexes into `mountains` for a series, otherwise it is -1.
+        - follow[i] is the following trail of a series, or the path_follow of a split.
+        - top[i] / bottom[i] are the split branches, otherwise they are -1.
+        - trails[i] is the original trail, which is what personalities are shown.
+
+    Node 0 is the root. Later edits to the original trail are not seen, compile again instead.
+    """
+
+    EMPTY = 0
+    SERIES = 1
+    SPLIT = 2
+
+    def __init__(self, trail: Trail) -> None:
+        """
+        Compile the given trail.
+
+        :complexity: O(N) where N is the number of trail nodes.
+        """
+        self.trails: list[Trail] = []
+        self.mountains: list[Mountain] = []
+        self.kind = array('b')
+        self.mountain = array('i')
+        self.top = array('i')
+        self.bottom = array('i')
+        self.follow = array('i')
+
+        # A subtrail that is reachable in more than one way is only compiled once.
+        index: dict[int, int] = {}
+        for current in trail.iter_trails():
+            if id(current) not in index:
+                index[id(current)] = len(self.trails)
+                self.trails.append(current)
+
+        for current in self.trails:
+            store = current.store
+            if isinstance(store, TrailSeries):
+                self.kind.append(self.SERIES)
+                self.mountain.append(len(self.mountains))
+                self.mountains.append(store.mountain)
+                self.top.append(-1)
+                self.bottom.append(-1)
+                self.follow.append(index[id(store.following)])
+            elif isinstance(store, TrailSplit):
+                self.kind.append(self.SPLIT)
+                self.mountain.append(-1)
+                self.top.append(index[id(store.path_top)])
+                self.bottom.append(index[id(store.path_bottom)])
+                self.follow.append(index[id(store.path_follow)])
+            else:
+                self.kind.append(self.EMPTY)
+                self.mountain.append(-1)
+                self.top.append(-1)
+                self.bottom.append(-1)
+                self.follow.append(-1)
+
+    def __getstate__(self) -> dict:
+        """
+        Pickles only the flat arrays and mountains.
+
+        Pickling the original trails directly would recurse once per node,
+        so they are rebuilt from the arrays when unpickling instead.
+        """
+        state = self.__dict__.copy()
+        del state["trails"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # Rebuild bottom up with an explicit stack, so shared subtrails stay shared.
+        trails: list[Trail | None] = [None] * len(self.kind)
+        stack = [0]
+        while stack:
+            i = stack[-1]
+            if trails[i] is not None:
+                stack.pop()
+                continue
+            missing = [child for child in (self.top[i], self.bottom[i], self.follow[i]) if child >= 0 and trails[child] is None]
+            if missing:
+                stack.extend(missing)
+                continue
+            if self.kind[i] == self.SERIES:
+                trails[i] = Trail(TrailSeries(self.mountains[self.mountain[i]], trails[self.follow[i]]))
+            elif self.kind[i] == self.SPLIT:
+                trails[i] = Trail(TrailSplit(trails[self.top[i]], trails[self.bottom[i]], trails[self.follow[i]]))
+            else:
+                trails[i] = Trail(None)
+            stack.pop()
+        self.trails = trails
+
+    def __len__(self) -> int:
+        """Returns the number of compiled trail nodes."""
+        return len(self.kind)
+
+    def follow_path(self, personality: WalkerPersonality) -> None:
+        """
+        Walks the trail exactly like `Trail.follow_path`.
+
+        :complexity: O(N) where N is the number of nodes visited, plus the cost of the personality.
+        """
+        kind = self.kind
+        mountain = self.mountain
+        top = self.top
+        bottom = self.bottom
+        follow = self.follow
+        mountains = self.mountains
+        trails = self.trails
+        add_mountain = personality.add_mountain
+        select_branch = personality.select_branch
+        series = self.SERIES
+        split = self.SPLIT
+
+        stack: list[int] = []
+        current = 0
+        while True:
+            current_kind = kind[current]
+            if current_kind == series:
+                add_mountain(mountains[mountain[current]])
+                current = follow[current]
+            elif current_kind == split:
+                stack.append(follow[current])
+                if select_branch(trails[top[current]], trails[bottom[current]]):
+                    current = top[current]
+                else:
+                    current = bottom[current]
+            elif stack:
+                current = stack.pop()
+            else:
+                break
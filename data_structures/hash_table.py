@@ -1,12 +1,14 @@
 """ Hash Table ADT
 
-Defines a Hash Table using Linear Probing for conflict resolution.
+Defines a Hash Table using Linear Probing for conflict resolution,
+and a variant using Robin Hood hashing.
 """
 from __future__ import annotations
 __author__ = 'Jackson Goerner'
 __since__ = '07/02/2023'
 
 
+from array import array
 from typing import TypeVar, Generic
 from data_structures.referential_array import ArrayR
 
@@ -23,9 +25,30 @@ class LinearProbeTable(Generic[K, V]):
 
     Type Arguments:
         - K:    Key Type. In most cases should be string.
-                Otherwise `hash` should be overwritten.
+                Otherwise `full_hash` (or `hash`) should be overwritten.
         - V:    Value Type.
 
+    Entries are stored in parallel arrays, one slot per position: keys, values, key hashes,
+    and a byte per slot saying whether it is occupied. Updating a key overwrites its value
+    in place, and no per entry object is allocated.
+
+    The key hash is the key's `full_hash`, which doesn't depend on the table size,
+    so resizing and deleting never hash a key again, and probing only compares keys
+    whose hashes match. If `hash` is replaced, the key hash is the key's position instead,
+    and keys are hashed again when the table is resized.
+    Replace `hash` (or `full_hash`) before adding anything to the table.
+
+    With `incremental`, growing the table doesn't move every entry at once.
+    The old arrays are kept next to the new ones, and each later get, set or delete
+    moves the entries in the next MIGRATE_STEPS slots of the old arrays across.
+    Until they are all moved, keys are looked up in the new arrays, then the old ones,
+    and old entries that are moved, set or deleted are left as tombstones (occupied 2).
+    A table whose `hash` was replaced is always resized all at once.
+    Emptying the next size's arrays costs O(M) for a new size M, so once the table is a quarter full
+    each insert also empties the next PREPARE_STEPS slots of them, and the resize starts with them ready.
+    Setting slots of an ArrayR still stalls now and then, as ctypes grows the dict that keeps its
+    references, in O(S) for S slots set so far.
+
     Unless stated otherwise, all methods have O(1) complexity.
     """
 
@@ -33,20 +56,100 @@ class LinearProbeTable(Generic[K, V]):
     TABLE_SIZES = [5, 13, 29, 53, 97, 193, 389, 769, 1543, 3079, 6151, 12289, 24593, 49157, 98317, 196613, 393241, 786433, 1572869]
 
     HASH_BASE = 31
+    # Full hashes are kept below this prime, so they fit in the hash array.
+    HASH_MODULUS = (1 << 61) - 1
+
+    # Old slots moved across by each operation during an incremental resize.
+    # Sizes at least double, so this finishes long before the next resize is due.
+    MIGRATE_STEPS = 8
+    # Slots of the next size's arrays emptied by each insert of an incremental table.
+    # Sizes roughly double, so they are ready long before the table is half full.
+    PREPARE_STEPS = 64
 
-    def __init__(self, sizes=None) -> None:
+    def __init__(self, sizes=None, incremental: bool = False) -> None:
         """
         Initialise the Hash Table.
         """
         if sizes is not None:
             self.TABLE_SIZES = sizes
+        self.incremental = incremental
+        # The arrays being moved out of during an incremental resize, and the next slot to move.
+        self.old_key_array: ArrayR[K] | None = None
+        self.old_value_array: ArrayR[V] | None = None
+        self.old_hash_array: array | None = None
+        self.old_occupied: bytearray | None = None
+        self.migrate_position = 0
+        # The storage for the next size while an incremental table fills it in (see _prepare).
+        self.prepared: list | None = None
         self.size_index = 0
-        self.array:ArrayR[tuple[K, V]] = ArrayR(self.TABLE_SIZES[self.size_index])
+        self._allocate(self.TABLE_SIZES[self.size_index])
         self.count = 0
 
-    def hash(self, key: K) -> int:
+    def _allocate(self, size: int) -> None:
         """
-        Hash a key for insert/retrieve/update into the hashtable.
+        Replaces the storage with empty arrays of the given size,
+        taking the prepared ones if they are for this size and ready.
+
+        :complexity: O(1) if the arrays were prepared, otherwise O(size).
+        """
+        prepared, self.prepared = self.prepared, None
+        if prepared is not None and prepared[0] == size and prepared[1] == size:
+            arrays = prepared[2]
+        else:
+            arrays = self._new_arrays(size)
+            self._fill_arrays(arrays, 0, size)
+        self._use_arrays(arrays)
+
+    def _new_arrays(self, size: int) -> list:
+        """
+        Returns the storage for a table of the given size, with none of its slots filled:
+        key and value arrays whose slots aren't set yet, and empty hash and occupied arrays.
+
+        :complexity: O(size) at C speed.
+        """
+        return [ArrayR.unfilled(size), ArrayR.unfilled(size), array('q'), bytearray()]
+
+    def _fill_arrays(self, arrays: list, start: int, end: int) -> None:
+        """
+        Makes slots start to end of storage from _new_arrays empty, when every slot before start is.
+
+        :complexity: O(end - start)
+        """
+        arrays[0].fill(start, end)
+        arrays[1].fill(start, end)
+        arrays[2].frombytes(bytes(8 * (end - start)))
+        arrays[3].extend(bytes(end - start))
+
+    def _use_arrays(self, arrays: list) -> None:
+        """Replaces the storage with filled storage from _new_arrays."""
+        self.key_array: ArrayR[K] = arrays[0]
+        self.value_array: ArrayR[V] = arrays[1]
+        self.hash_array: array = arrays[2]
+        self.occupied: bytearray = arrays[3]
+
+    def _prepare(self) -> None:
+        """
+        Fills the next PREPARE_STEPS slots of the storage for the next table size,
+        once the table is a quarter full. Does nothing at the largest size or once it is ready.
+
+        :complexity: O(PREPARE_STEPS), plus O(M) at C speed the first time, where M is the next size.
+        """
+        if self.count <= self.table_size / 4 or self.size_index + 1 >= len(self.TABLE_SIZES):
+            return
+        size = self.TABLE_SIZES[self.size_index + 1]
+        prepared = self.prepared
+        if prepared is None or prepared[0] != size:
+            # [size, slots filled, storage]
+            prepared = self.prepared = [size, 0, self._new_arrays(size)]
+        start = prepared[1]
+        if start < size:
+            end = min(size, start + self.PREPARE_STEPS)
+            self._fill_arrays(prepared[2], start, end)
+            prepared[1] = end
+
+    def full_hash(self, key: K) -> int:
+        """
+        Hash a key independently of the table size.
 
         :complexity: O(len(key))
         """
@@ -54,13 +157,36 @@ class LinearProbeTable(Generic[K, V]):
         value = 0
         a = 31415
         for char in key:
-            value = (ord(char) + a * value) % self.table_size
-            a = a * self.HASH_BASE % (self.table_size - 1)
+            value = (ord(char) + a * value) % self.HASH_MODULUS
+            a = a * self.HASH_BASE % (self.HASH_MODULUS - 1)
         return value
 
+    def hash(self, key: K) -> int:
+        """
+        Hash a key for insert/retrieve/update into the hashtable.
+
+        :complexity: O(len(key))
+        """
+        return self.full_hash(key) % self.table_size
+
+    def _key_hash(self, key: K) -> int:
+        """
+        Returns the hash kept with a key's entry: its full hash, or its position if `hash` was replaced.
+        Either way, the key's position is the key hash modulo the table size.
+
+        :complexity: O(len(key))
+        """
+        if self._hash_replaced():
+            return self.hash(key)
+        return self.full_hash(key)
+
+    def _hash_replaced(self) -> bool:
+        """Returns whether `hash` was replaced, on this table or its class."""
+        return "hash" in self.__dict__ or type(self).hash is not LinearProbeTable.hash
+
     @property
     def table_size(self) -> int:
-        return len(self.array)
+        return len(self.occupied)
 
     def __len__(self) -> int:
         """
@@ -77,17 +203,30 @@ class LinearProbeTable(Generic[K, V]):
         :raises KeyError: When the key is not in the table, but is_insert is False.
         :raises FullError: When a table is full and cannot be inserted.
         """
+        return self._probe(key, self._key_hash(key), is_insert)
+
+    def _probe(self, key: K, key_hash: int, is_insert: bool) -> int:
+        """
+        Linear probe for a key whose key hash is already known.
+        :complexity best: O(1) first position is empty
+        :complexity worst: O(N*comp(K)) when we've searched the entire table, and every hash matched
+                        where N is the tablesize
+        :raises KeyError: When the key is not in the table, but is_insert is False.
+        :raises FullError: When a table is full and cannot be inserted.
+        """
+        occupied = self.occupied
+        hashes = self.hash_array
         # Initial position
-        position = self.hash(key)
+        position = key_hash % self.table_size
 
         for _ in range(self.table_size):
-            if self.array[position] is None:
+            if not occupied[position]:
                 # Empty spot. Am I upserting or retrieving?
                 if is_insert:
                     return position
                 else:
                     raise KeyError(key)
-            elif self.array[position][0] == key:
+            elif hashes[position] == key_hash and self.key_array[position] == key:
                 return position
             else:
                 # Taken by something else. Time to linear probe.
@@ -106,8 +245,10 @@ class LinearProbeTable(Generic[K, V]):
         """
         res = []
         for x in range(self.table_size):
-            if self.array[x] is not None:
-                res.append(self.array[x][0])
+            if self.occupied[x]:
+                res.append(self.key_array[x])
+        for x in self._old_positions():
+            res.append(self.old_key_array[x])
         return res
 
     def values(self) -> list[V]:
@@ -118,8 +259,10 @@ class LinearProbeTable(Generic[K, V]):
         """
         res = []
         for x in range(self.table_size):
-            if self.array[x] is not None:
-                res.append(self.array[x][1])
+            if self.occupied[x]:
+                res.append(self.value_array[x])
+        for x in self._old_positions():
+            res.append(self.old_value_array[x])
         return res
 
     def __contains__(self, key: K) -> bool:
@@ -142,8 +285,26 @@ class LinearProbeTable(Generic[K, V]):
         :complexity: See linear probe.
         :raises KeyError: when the key doesn't exist.
         """
-        position = self._linear_probe(key, False)
-        return self.array[position][1]
+        position, current = self._locate(key)
+        return self.value_array[position] if current else self.old_value_array[position]
+
+    def _locate(self, key: K) -> tuple[int, bool]:
+        """
+        Moves a step of any incremental resize along, then finds a key,
+        returning its position and whether that is in the current arrays (rather than the old ones).
+
+        :complexity: See linear probe, plus probing the old arrays during an incremental resize.
+        :raises KeyError: when the key doesn't exist.
+        """
+        self._migrate()
+        key_hash = self._key_hash(key)
+        try:
+            return self._probe(key, key_hash, False), True
+        except KeyError:
+            position = self._find_old(key, key_hash)
+            if position < 0:
+                raise
+            return position, False
 
     def __setitem__(self, key: K, data: V) -> None:
         """
@@ -152,38 +313,137 @@ class LinearProbeTable(Generic[K, V]):
         :complexity: See linear probe.
         :raises FullError: when the table cannot be resized further.
         """
+        if self._insert(key, data) and len(self) > self.table_size / 2:
+            self._rehash()
 
-        position = self._linear_probe(key, True)
+    def _insert(self, key: K, data: V) -> bool:
+        """
+        Sets a key's value without resizing, returning whether the key is new.
 
-        if self.array[position] is None:
-            self.count += 1
+        :complexity: See linear probe.
+        :raises FullError: when the table is full.
+        """
+        self._migrate()
+        if self.incremental:
+            self._prepare()
+        key_hash = self._key_hash(key)
+        position = self._probe(key, key_hash, True)
+
+        if self.occupied[position]:
+            # Only the value changes.
+            self.value_array[position] = data
+            return False
 
-        self.array[position] = (key, data)
+        self._forget_old(key, key_hash)
+        self._store(position, key, data, key_hash)
+        self.count += 1
+        return True
 
+    def update(self, items) -> None:
+        """
+        Sets every (key, value) pair from a mapping or an iterable of pairs, like `dict.update`.
+        The table is resized once up front, rather than as it fills up.
+
+        :complexity: O(N + M) plus the probing for each pair,
+            where N is the new table size and M is the number of pairs.
+        :raises FullError: when the table cannot be resized far enough.
+        """
+        if hasattr(items, "keys"):
+            items = [(key, items[key]) for key in items.keys()]
+        elif not hasattr(items, "__len__"):
+            items = list(items)
+        # Keys already in the table only make this reserve more than needed.
+        self.reserve(len(self) + len(items))
+        for key, data in items:
+            self._insert(key, data)
         if len(self) > self.table_size / 2:
+            # Only when the table couldn't be made big enough.
             self._rehash()
 
+    @classmethod
+    def from_items(cls, items, sizes=None) -> LinearProbeTable[K, V]:
+        """
+        Makes a table holding every (key, value) pair from a mapping or an iterable of pairs.
+
+        :complexity: See update.
+        """
+        table = cls(sizes)
+        table.update(items)
+        return table
+
+    def reserve(self, n: int) -> None:
+        """
+        Makes the table big enough to hold n entries without resizing,
+        going straight to the right size instead of through every size in between.
+        The table never shrinks, and stops at the largest size.
+
+        :complexity: O(1) if the table is already big enough, otherwise see _resize.
+        """
+        size_index = self.size_index
+        while size_index + 1 < len(self.TABLE_SIZES) and n > self.TABLE_SIZES[size_index] / 2:
+            size_index += 1
+        if size_index != self.size_index:
+            self._resize(size_index)
+
+    def _store(self, position: int, key: K, data: V, key_hash: int) -> None:
+        """Fills a slot."""
+        self.key_array[position] = key
+        self.value_array[position] = data
+        self.hash_array[position] = key_hash
+        self.occupied[position] = 1
+
+    def _clear(self, position: int) -> None:
+        """Empties a slot, dropping its key and value."""
+        self.key_array[position] = None
+        self.value_array[position] = None
+        self.occupied[position] = 0
+
     def __delitem__(self, key: K) -> None:
         """
         Deletes a (key, value) pair in our hash table.
 
         :complexity best: O(hash(key)) deleting item is not probed and in correct spot.
-        :complexity worst: O(N*hash(key)+N^2*comp(K)) deleting item is midway through large chain.
+        :complexity worst: O(hash(key)+N^2) deleting item is midway through large chain.
         :raises KeyError: when the key doesn't exist.
         """
-        position = self._linear_probe(key, False)
-        # Remove the element
-        self.array[position] = None
+        position, current = self._locate(key)
         self.count -= 1
+        if current:
+            self._remove(position)
+        else:
+            self._tombstone(position)
+
+    def _remove(self, position: int) -> None:
+        """
+        Empties a slot, moving the rest of its cluster so every entry can still be found.
+
+        :complexity best: O(1) the next slot is empty.
+        :complexity worst: O(N^2) the slot is midway through a large cluster.
+        """
+        # Remove the element
+        self._clear(position)
         # Start moving over the cluster
         position = (position + 1) % self.table_size
-        while self.array[position] is not None:
-            key2, value = self.array[position]
-            self.array[position] = None
-            # Reinsert.
-            newpos = self._linear_probe(key2, True)
-            self.array[newpos] = (key2, value)
+        while self.occupied[position]:
+            key2, value, key_hash = self.key_array[position], self.value_array[position], self.hash_array[position]
+            self._clear(position)
+            # Reinsert, reusing the kept hash.
+            self._place(key2, value, key_hash)
+            position = (position + 1) % self.table_size
+
+    def _place(self, key: K, data: V, key_hash: int) -> None:
+        """
+        Puts an entry for a key that isn't in the table into the first free position from its hash.
+        Doesn't change the count or resize.
+
+        :complexity best: O(1) No probing.
+        :complexity worst: O(N) where N is the tablesize
+        """
+        occupied = self.occupied
+        position = key_hash % self.table_size
+        while occupied[position]:
             position = (position + 1) % self.table_size
+        self._store(position, key, data, key_hash)
 
     def is_empty(self) -> bool:
         return self.count == 0
@@ -195,21 +455,119 @@ class LinearProbeTable(Generic[K, V]):
         """
         Need to resize table and reinsert all values
 
-        :complexity best: O(N*hash(K)) No probing.
-        :complexity worst: O(N*hash(K) + N^2*comp(K)) Lots of probing.
-        Where N is len(self)
+        :complexity best: O(N) No probing.
+        :complexity worst: O(N^2) Lots of probing.
+        Where N is len(self), plus O(N*hash(K)) if `hash` was replaced.
         """
-        old_array = self.array
-        self.size_index += 1
-        if self.size_index == len(self.TABLE_SIZES):
+        if self.size_index + 1 >= len(self.TABLE_SIZES):
             # Cannot be resized further.
             return
-        self.array = ArrayR(self.TABLE_SIZES[self.size_index])
-        self.count = 0
-        for item in old_array:
-            if item is not None:
-                key, value = item
-                self[key] = value
+        if self.incremental and not self._hash_replaced():
+            self._start_resize(self.size_index + 1)
+        else:
+            self._resize(self.size_index + 1)
+
+    def _resize(self, size_index: int) -> None:
+        """
+        Moves every entry into a table of size TABLE_SIZES[size_index].
+
+        :complexity: See _rehash, plus O(M) where M is the new table size.
+        """
+        self._finish_resize()
+        self.size_index = size_index
+        old_keys, old_values, old_hashes, old_occupied = self.key_array, self.value_array, self.hash_array, self.occupied
+        self._allocate(self.TABLE_SIZES[self.size_index])
+        # Kept positions from a replaced `hash` are out of date in the new table.
+        rehash_keys = self._hash_replaced()
+        for position in range(len(old_occupied)):
+            if old_occupied[position]:
+                key = old_keys[position]
+                self._place(key, old_values[position], self.hash(key) if rehash_keys else old_hashes[position])
+
+    def _start_resize(self, size_index: int) -> None:
+        """
+        Starts moving entries into a table of size TABLE_SIZES[size_index], a few at a time.
+
+        :complexity: O(M) where M is the new table size, or O(1) if its storage was prepared (see _prepare),
+            plus finishing any resize already under way.
+        """
+        self._finish_resize()
+        self.size_index = size_index
+        self.old_key_array, self.old_value_array = self.key_array, self.value_array
+        self.old_hash_array, self.old_occupied = self.hash_array, self.occupied
+        self.migrate_position = 0
+        self._allocate(self.TABLE_SIZES[self.size_index])
+
+    def _finish_resize(self) -> None:
+        """
+        Moves every entry left in the old arrays across, ending any incremental resize.
+
+        :complexity: O(N) where N is the old table size.
+        """
+        if self.old_occupied is not None:
+            self._migrate(len(self.old_occupied))
+
+    def _migrate(self, steps: int | None = None) -> None:
+        """
+        Moves the entries in the next `steps` (MIGRATE_STEPS by default) slots of the old arrays
+        into the current ones, dropping the old arrays once every slot has been moved.
+        Does nothing when no incremental resize is under way.
+
+        :complexity: O(steps) plus placing each entry moved.
+        """
+        old_occupied = self.old_occupied
+        if old_occupied is None:
+            return
+        start = self.migrate_position
+        end = min(len(old_occupied), start + (self.MIGRATE_STEPS if steps is None else steps))
+        for position in range(start, end):
+            if old_occupied[position] == 1:
+                self._place(self.old_key_array[position], self.old_value_array[position], self.old_hash_array[position])
+                self._tombstone(position)
+        self.migrate_position = end
+        if end == len(old_occupied):
+            self.old_key_array = self.old_value_array = self.old_hash_array = self.old_occupied = None
+
+    def _find_old(self, key: K, key_hash: int) -> int:
+        """
+        Returns the position of a key in the old arrays, or -1 if it isn't there
+        (or no incremental resize is under way). Tombstones are probed past.
+
+        :complexity: O(C*comp(K)) where C is the length of the key's old cluster.
+        """
+        old_occupied = self.old_occupied
+        if old_occupied is None:
+            return -1
+        old_size = len(old_occupied)
+        position = key_hash % old_size
+        for _ in range(old_size):
+            if not old_occupied[position]:
+                return -1
+            elif old_occupied[position] == 1 and self.old_hash_array[position] == key_hash \
+                    and self.old_key_array[position] == key:
+                return position
+            position = (position + 1) % old_size
+        return -1
+
+    def _forget_old(self, key: K, key_hash: int) -> None:
+        """Tombstones and uncounts a key's old entry, if it has one, before it is set in the current arrays."""
+        position = self._find_old(key, key_hash)
+        if position >= 0:
+            self._tombstone(position)
+            self.count -= 1
+
+    def _tombstone(self, position: int) -> None:
+        """Marks an old slot as moved or deleted, dropping its key and value."""
+        self.old_key_array[position] = None
+        self.old_value_array[position] = None
+        self.old_occupied[position] = 2
+
+    def _old_positions(self):
+        """Yields the positions of the entries still in the old arrays."""
+        if self.old_occupied is not None:
+            for position in range(self.migrate_position, len(self.old_occupied)):
+                if self.old_occupied[position] == 1:
+                    yield position
 
     def __str__(self) -> str:
         """
@@ -218,8 +576,170 @@ class LinearProbeTable(Generic[K, V]):
         :complexity: O(N * (str(key) + str(value))) where N is the table size
         """
         result = ""
-        for item in self.array:
-            if item is not None:
-                (key, value) = item
+        for position in range(self.table_size):
+            if self.occupied[position]:
+                key, value = self.key_array[position], self.value_array[position]
                 result += "(" + str(key) + "," + str(value) + ")\n"
+        for position in self._old_positions():
+            key, value = self.old_key_array[position], self.old_value_array[position]
+            result += "(" + str(key) + "," + str(value) + ")\n"
         return result
+
+
+class RobinHoodTable(LinearProbeTable[K, V]):
+    """
+    Linear Probe Table using Robin Hood hashing.
+
+    Alongside each entry, a distance array keeps how far the entry was probed past
+    the position its key hashes to. An insert takes the slot of any entry closer to
+    its own position than the insert is, and moves that entry along instead.
+    This keeps probe lengths short and even, and lets a lookup stop as soon as it
+    reaches an entry closer to home than it is.
+
+    Deletes shift the rest of the cluster back one slot (backward shift deletion),
+    so they never rehash or reinsert anything.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def _new_arrays(self, size: int) -> list:
+        """
+        Returns the storage for a table of the given size, with none of its slots filled.
+
+        :complexity: O(size) at C speed.
+        """
+        return super()._new_arrays(size) + [array('i')]
+
+    def _fill_arrays(self, arrays: list, start: int, end: int) -> None:
+        """
+        Makes slots start to end of storage from _new_arrays empty, when every slot before start is.
+
+        :complexity: O(end - start)
+        """
+        super()._fill_arrays(arrays, start, end)
+        arrays[4].frombytes(bytes(4 * (end - start)))
+
+    def _use_arrays(self, arrays: list) -> None:
+        """Replaces the storage with filled storage from _new_arrays."""
+        super()._use_arrays(arrays)
+        self.distance_array: array = arrays[4]
+
+    def _store(self, position: int, key: K, data: V, key_hash: int, distance: int = 0) -> None:
+        """Fills a slot."""
+        super()._store(position, key, data, key_hash)
+        self.distance_array[position] = distance
+
+    def _robin_hood_probe(self, key: K, key_hash: int) -> tuple[int, int, bool]:
+        """
+        Probe for a key, returning (position, distance, found).
+        When the key isn't found, position is where it belongs and distance is how far that is from its hash.
+
+        :complexity best: O(1) first position is empty or holds the key
+        :complexity worst: O(D*comp(K)) where D is the longest probe distance in the table
+        :raises FullError: When the key isn't found and the table is full.
+        """
+        occupied = self.occupied
+        hashes = self.hash_array
+        distances = self.distance_array
+        position = key_hash % self.table_size
+        for distance in range(self.table_size):
+            if not occupied[position] or distances[position] < distance:
+                return position, distance, False
+            elif hashes[position] == key_hash and self.key_array[position] == key:
+                return position, distance, True
+            position = (position + 1) % self.table_size
+        raise FullError("Table is full!")
+
+    def _probe(self, key: K, key_hash: int, is_insert: bool) -> int:
+        """
+        Find the position of this key in the hash table, or where it belongs if it is missing.
+
+        :complexity: See _robin_hood_probe.
+        :raises KeyError: When the key is not in the table, but is_insert is False.
+        :raises FullError: When a table is full and cannot be inserted.
+        """
+        try:
+            position, _, found = self._robin_hood_probe(key, key_hash)
+        except FullError:
+            if is_insert:
+                raise
+            raise KeyError(key)
+        if not found and not is_insert:
+            raise KeyError(key)
+        return position
+
+    def _insert(self, key: K, data: V) -> bool:
+        """
+        Sets a key's value without resizing, returning whether the key is new.
+
+        :complexity best: O(hash(key)) the key's position is free, or holds the key.
+        :complexity worst: O(hash(key) + C*comp(K)) where C is the length of the cluster moved along.
+        :raises FullError: when the table is full.
+        """
+        self._migrate()
+        if self.incremental:
+            self._prepare()
+        key_hash = self._key_hash(key)
+        position, distance, found = self._robin_hood_probe(key, key_hash)
+        if found:
+            # Only the value changes.
+            self.value_array[position] = data
+            return False
+
+        if self.is_full():
+            raise FullError("Table is full!")
+        self._forget_old(key, key_hash)
+        self._displace(position, key, data, key_hash, distance)
+        self.count += 1
+        return True
+
+    def _place(self, key: K, data: V, key_hash: int) -> None:
+        """
+        Puts an entry for a key that isn't in the table where it belongs.
+        Doesn't change the count or resize.
+
+        :complexity: O(C) where C is the length of the cluster moved along.
+        """
+        position, distance, _ = self._robin_hood_probe(key, key_hash)
+        self._displace(position, key, data, key_hash, distance)
+
+    def _displace(self, position: int, key: K, data: V, key_hash: int, distance: int) -> None:
+        """
+        Puts an entry at the given position, moving the entries after it along until one reaches an empty slot.
+
+        :complexity: O(C) where C is the length of the cluster moved along.
+        """
+        occupied = self.occupied
+        distances = self.distance_array
+        while occupied[position]:
+            if distances[position] < distance:
+                # Swap, and carry on with the entry that was here.
+                moved = self.key_array[position], self.value_array[position], self.hash_array[position], distances[position]
+                self._store(position, key, data, key_hash, distance)
+                key, data, key_hash, distance = moved
+            position = (position + 1) % self.table_size
+            distance += 1
+        self._store(position, key, data, key_hash, distance)
+
+    def _remove(self, position: int) -> None:
+        """
+        Empties a slot, shifting the rest of its cluster back.
+
+        :complexity best: O(1) the next entry is empty or in its own position.
+        :complexity worst: O(C) where C is the length of the cluster shifted back.
+        """
+        occupied = self.occupied
+        distances = self.distance_array
+        following = (position + 1) % self.table_size
+        # Shift back every following entry that isn't in its own position.
+        while occupied[following] and distances[following] > 0:
+            self._store(
+                position,
+                self.key_array[following],
+                self.value_array[following],
+                self.hash_array[following],
+                distances[following] - 1,
+            )
+            position = following
+            following = (following + 1) % self.table_size
+        self._clear(position)
@@ -33,6 +33,27 @@ class ArrayR(Generic[T]):
         self.array = (length * py_object)() # initialises the space
         self.array[:] =  [None for _ in range(length)]
 
+    @classmethod
+    def unfilled(cls, length: int) -> 'ArrayR[T]':
+        """ Creates an array of references of the given length without setting them,
+        so it can be filled a part at a time with fill. Reading a position before
+        it is set raises ValueError.
+        :complexity: O(length) at C speed, with nothing done per position
+        :pre: length > 0
+        """
+        if length <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        array = cls.__new__(cls)
+        array.array = (length * py_object)()
+        return array
+
+    def fill(self, start: int, end: int, value: T = None) -> None:
+        """ Sets the objects in positions start to end - 1 to value
+        :complexity: O(end - start)
+        :pre: 0 <= start <= end <= length
+        """
+        self.array[start:end] = [value] * (end - start)
+
     def __len__(self) -> int:
         """ Returns the length of the array
         :complexity: O(1)
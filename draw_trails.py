@@ -6,6 +6,7 @@ A bit of a mess, you 100% don't need to look at this for your assignment!
 
 from __future__ import annotations
 from dataclasses import dataclass, field
+from typing import Callable
 from mountain import Mountain
 from utils import av, bezier
 from constants import DrawMode
@@ -64,106 +65,107 @@ class TrailDraw:
     ### Click constants
     LINE_VERTICAL_BOX = MOUNTAIN_HEIGHT / 2
 
-    def __init__(self, trail: TrailBox) -> None:
+    def __init__(self, trail: TrailBox, on_edit: Callable[[tuple[str, ...], str, tuple], None]|None=None) -> None:
+        """
+        `on_edit`, if given, is told about every edit made by an action from `box_and_action`:
+        the path of slot names from the root to the edited trail, the edit method's name, and its arguments.
+        """
         self.trail = trail
+        self.on_edit = on_edit
+        # Path to the trail the last action from `box_and_action` works on.
+        self.action_path: tuple[str, ...] = ()
 
     # VISUAL CALCULATIONS
 
     def required_height(self, cur_trail: TrailBox|None=None) -> int:
         if cur_trail is None:
-            cur_trail = self.trail.store
-        else:
-            cur_trail = cur_trail.store
-        if cur_trail is None:
-            return self.EMPTY_HEIGHT
-        elif isinstance(cur_trail, TrailSeries):
-            return max(self.MOUNTAIN_HEIGHT, self.required_height(cur_trail.following))
-        else:
-            return max(
-                self.required_height(cur_trail.path_top) + self.BRANCH_SEPARATION + self.required_height(cur_trail.path_bottom),
-                self.required_height(cur_trail.path_follow)
-            )
+            cur_trail = self.trail
+        return cur_trail.fold(
+            self.EMPTY_HEIGHT,
+            lambda series, following: max(self.MOUNTAIN_HEIGHT, following),
+            lambda split, top, bottom, follow: max(top + self.BRANCH_SEPARATION + bottom, follow),
+            ("required_height", type(self)),
+        )
 
     def required_width(self, cur_trail: TrailBox|None=None) -> int:
         if cur_trail is None:
-            cur_trail = self.trail.store
-        else:
-            cur_trail = cur_trail.store
-        if cur_trail is None:
-            return 0
-        elif isinstance(cur_trail, TrailSeries):
-            return self.TOTAL_MOUNTAIN_WIDTH + self.required_width(cur_trail.following)
-        else:
-            return 2 * self.BRANCH_WIDTH + max(
-                self.required_width(cur_trail.path_top),
-                self.required_width(cur_trail.path_bottom),
+            cur_trail = self.trail
+        return cur_trail.fold(
+            0,
+            lambda series, following: self.TOTAL_MOUNTAIN_WIDTH + following,
+            lambda split, top, bottom, follow: 2 * self.BRANCH_WIDTH + max(
+                top,
+                bottom,
                 self.MIN_BRANCH_CONTENT_WIDTH,
-            ) + self.required_width(cur_trail.path_follow)
+            ) + follow,
+            ("required_width", type(self)),
+        )
 
     def draw_in_box(self, height, width, minx, miny, cur_trail: TrailBox|None=None) -> None:
         if cur_trail is None:
-            ref_trail = self.trail
-            cur_trail = self.trail.store
-        else:
-            ref_trail = cur_trail
-            cur_trail = cur_trail.store
-        if cur_trail is None:
-            self.draw_line(minx, miny + height/2, minx + width, miny + height/2)
-            ref_trail.trail_box = Box(minx, miny + height/2-self.LINE_VERTICAL_BOX, width, 2*self.LINE_VERTICAL_BOX)
-        elif isinstance(cur_trail, TrailSeries):
-            ref_trail.trail_box = Box(minx, miny, width, height)
-            p1 = self.TOTAL_MOUNTAIN_WIDTH
-            p2 = self.required_width(cur_trail.following)
-            total = p1 + p2
-            # Draw mountain
-            p1_total_dist = (p1 / total) * width
-            start_mountain_trail_x = minx
-            mountain_width = (self.MIN_MOUNTAIN_WIDTH / self.TOTAL_MOUNTAIN_WIDTH) * p1_total_dist
-            mountain_width = max(mountain_width, self.MIN_MOUNTAIN_WIDTH)
-            mountain_width = min(mountain_width, self.MAX_MOUNTAIN_WIDTH)
-            start_mountain_x = minx + p1_total_dist/2 - mountain_width/2
-            end_mountain_x = start_mountain_x + mountain_width
-            end_mountain_trail_x = minx + p1_total_dist
-            mid = miny + height/2
-            self.draw_mountain(av(start_mountain_x, end_mountain_x), mid, (end_mountain_x - start_mountain_x) / self.MIN_MOUNTAIN_WIDTH, cur_trail.mountain)
-            self.draw_line(start_mountain_trail_x, mid, start_mountain_x, mid)
-            self.draw_line(end_mountain_x, mid, end_mountain_trail_x, mid)
-            mountain_actual_height = self.MOUNTAIN_HEIGHT * (end_mountain_x - start_mountain_x) / self.MIN_MOUNTAIN_WIDTH
-            cur_trail.before_box = Box(start_mountain_trail_x, mid - mountain_actual_height/2, start_mountain_x - start_mountain_trail_x, mountain_actual_height)
-            cur_trail.mountain_box = Box(start_mountain_x, mid - mountain_actual_height/2, end_mountain_x - start_mountain_x, mountain_actual_height)
-            cur_trail.after_box = Box(end_mountain_x, mid - mountain_actual_height/2, end_mountain_trail_x - end_mountain_x, mountain_actual_height)
-            # Draw rest
-            self.draw_in_box(height, p2/total*width, minx+p1_total_dist, miny, cur_trail.following)
-        else:
-            ref_trail.trail_box = Box(minx, miny, width, height)
-            b1 = self.required_width(cur_trail.path_top)
-            b2 = self.required_width(cur_trail.path_bottom)
-            b3 = self.required_width(cur_trail.path_follow)
-            total = b3 + max(b1, b2)
-            mid = miny + height/2
-            pth = self.required_height(cur_trail.path_top)
-            pbh = self.required_height(cur_trail.path_bottom)
-            total_height = pth + pbh
-            top_section = pth / total_height * (height - self.BRANCH_SEPARATION)
-            bot_section = pbh / total_height * (height - self.BRANCH_SEPARATION)
-            if total > 0:
-                branch_dist = max(
-                    max(b1, b2)/total*(width - 2*self.BRANCH_WIDTH),
-                    self.MIN_BRANCH_CONTENT_WIDTH
-                )
+            cur_trail = self.trail
+        # Subtrail sizes are cached until the subtrail changes, so asking for them at every level is cheap.
+        # Boxes still to draw. Children are pushed in reverse so they are drawn in order.
+        stack = [(height, width, minx, miny, cur_trail)]
+        while stack:
+            height, width, minx, miny, ref_trail = stack.pop()
+            cur_trail = ref_trail.store
+            if cur_trail is None:
+                self.draw_line(minx, miny + height/2, minx + width, miny + height/2)
+                ref_trail.trail_box = Box(minx, miny + height/2-self.LINE_VERTICAL_BOX, width, 2*self.LINE_VERTICAL_BOX)
+            elif isinstance(cur_trail, TrailSeries):
+                ref_trail.trail_box = Box(minx, miny, width, height)
+                p1 = self.TOTAL_MOUNTAIN_WIDTH
+                p2 = self.required_width(cur_trail.following)
+                total = p1 + p2
+                # Draw mountain
+                p1_total_dist = (p1 / total) * width
+                start_mountain_trail_x = minx
+                mountain_width = (self.MIN_MOUNTAIN_WIDTH / self.TOTAL_MOUNTAIN_WIDTH) * p1_total_dist
+                mountain_width = max(mountain_width, self.MIN_MOUNTAIN_WIDTH)
+                mountain_width = min(mountain_width, self.MAX_MOUNTAIN_WIDTH)
+                start_mountain_x = minx + p1_total_dist/2 - mountain_width/2
+                end_mountain_x = start_mountain_x + mountain_width
+                end_mountain_trail_x = minx + p1_total_dist
+                mid = miny + height/2
+                self.draw_mountain(av(start_mountain_x, end_mountain_x), mid, (end_mountain_x - start_mountain_x) / self.MIN_MOUNTAIN_WIDTH, cur_trail.mountain)
+                self.draw_line(start_mountain_trail_x, mid, start_mountain_x, mid)
+                self.draw_line(end_mountain_x, mid, end_mountain_trail_x, mid)
+                mountain_actual_height = self.MOUNTAIN_HEIGHT * (end_mountain_x - start_mountain_x) / self.MIN_MOUNTAIN_WIDTH
+                cur_trail.before_box = Box(start_mountain_trail_x, mid - mountain_actual_height/2, start_mountain_x - start_mountain_trail_x, mountain_actual_height)
+                cur_trail.mountain_box = Box(start_mountain_x, mid - mountain_actual_height/2, end_mountain_x - start_mountain_x, mountain_actual_height)
+                cur_trail.after_box = Box(end_mountain_x, mid - mountain_actual_height/2, end_mountain_trail_x - end_mountain_x, mountain_actual_height)
+                # Draw rest
+                stack.append((height, p2/total*width, minx+p1_total_dist, miny, cur_trail.following))
             else:
-                branch_dist = self.MIN_BRANCH_CONTENT_WIDTH
-            b3_dist = (width - 2*self.BRANCH_WIDTH) - branch_dist
-            # Draw branches
-            self.draw_branch(minx, mid, minx+self.BRANCH_WIDTH, miny + bot_section + self.BRANCH_SEPARATION + top_section / 2, miny + bot_section / 2)
-            self.draw_branch(minx + width - b3_dist, mid, minx + width - self.BRANCH_WIDTH - b3_dist, miny + bot_section + self.BRANCH_SEPARATION + top_section / 2, miny + bot_section / 2)
-            cur_trail.branch_start_box = Box(minx, mid - self.BRANCH_SEPARATION/2 - top_section/2, self.BRANCH_WIDTH, bot_section/2 + top_section/2 + self.BRANCH_SEPARATION)
-            cur_trail.branch_end_box = Box(minx+width-b3_dist-self.BRANCH_WIDTH, mid - self.BRANCH_SEPARATION/2 - top_section/2, self.BRANCH_WIDTH, bot_section/2 + top_section/2 + self.BRANCH_SEPARATION)
-            # Draw top & bottom
-            self.draw_in_box(top_section, branch_dist, minx+self.BRANCH_WIDTH, miny+bot_section+self.BRANCH_SEPARATION, cur_trail.path_top)
-            self.draw_in_box(bot_section, branch_dist, minx+self.BRANCH_WIDTH, miny, cur_trail.path_bottom)
-            # Draw following
-            self.draw_in_box(height, b3_dist, minx + width - b3_dist, miny, cur_trail.path_follow)
+                ref_trail.trail_box = Box(minx, miny, width, height)
+                b1 = self.required_width(cur_trail.path_top)
+                b2 = self.required_width(cur_trail.path_bottom)
+                b3 = self.required_width(cur_trail.path_follow)
+                total = b3 + max(b1, b2)
+                mid = miny + height/2
+                pth = self.required_height(cur_trail.path_top)
+                pbh = self.required_height(cur_trail.path_bottom)
+                total_height = pth + pbh
+                top_section = pth / total_height * (height - self.BRANCH_SEPARATION)
+                bot_section = pbh / total_height * (height - self.BRANCH_SEPARATION)
+                if total > 0:
+                    branch_dist = max(
+                        max(b1, b2)/total*(width - 2*self.BRANCH_WIDTH),
+                        self.MIN_BRANCH_CONTENT_WIDTH
+                    )
+                else:
+                    branch_dist = self.MIN_BRANCH_CONTENT_WIDTH
+                b3_dist = (width - 2*self.BRANCH_WIDTH) - branch_dist
+                # Draw branches
+                self.draw_branch(minx, mid, minx+self.BRANCH_WIDTH, miny + bot_section + self.BRANCH_SEPARATION + top_section / 2, miny + bot_section / 2)
+                self.draw_branch(minx + width - b3_dist, mid, minx + width - self.BRANCH_WIDTH - b3_dist, miny + bot_section + self.BRANCH_SEPARATION + top_section / 2, miny + bot_section / 2)
+                cur_trail.branch_start_box = Box(minx, mid - self.BRANCH_SEPARATION/2 - top_section/2, self.BRANCH_WIDTH, bot_section/2 + top_section/2 + self.BRANCH_SEPARATION)
+                cur_trail.branch_end_box = Box(minx+width-b3_dist-self.BRANCH_WIDTH, mid - self.BRANCH_SEPARATION/2 - top_section/2, self.BRANCH_WIDTH, bot_section/2 + top_section/2 + self.BRANCH_SEPARATION)
+                # Draw following, then bottom & top (popped in reverse)
+                stack.append((height, b3_dist, minx + width - b3_dist, miny, cur_trail.path_follow))
+                stack.append((bot_section, branch_dist, minx+self.BRANCH_WIDTH, miny, cur_trail.path_bottom))
+                stack.append((top_section, branch_dist, minx+self.BRANCH_WIDTH, miny+bot_section+self.BRANCH_SEPARATION, cur_trail.path_top))
 
     def draw_line(self, sx, sy, ex, ey):
         import arcade
@@ -215,41 +217,55 @@ class TrailDraw:
     def box_and_action(self, mouse_pos: tuple[float, float], mode=DrawMode, cur_trail: Trail|None=None, parent_sets: tuple[Trail, str]|None=None) -> tuple[Box|None, function|None, Trail|None]:
         if cur_trail is None:
             ref_trail = self.trail
-            cur_trail = self.trail.store
             parent_sets = (self, "trail")
         else:
             ref_trail = cur_trail
-            cur_trail = cur_trail.store
-        if mouse_pos not in ref_trail.trail_box:
-            return None, None, None
+        path = []
         def set_m(ref, cur_method):
+            edit_path = self.action_path = tuple(path)
             def func(*m):
                 ref.store = cur_method(*m)
+                if self.on_edit is not None:
+                    self.on_edit(edit_path, cur_method.__name__, m)
             return func
         def set_parent(parent_set, cur_method):
             parent, attribute = parent_set
+            edit_path = self.action_path = tuple(path)
             def func(*m):
                 setattr(parent, attribute, cur_method(*m))
+                if self.on_edit is not None:
+                    self.on_edit(edit_path, cur_method.__name__, m)
             return func
-        if cur_trail is None:
-            if mode in [DrawMode.ADD_MOUNTAIN, DrawMode.ADD_BRANCH]:
-                return ref_trail.trail_box, set_parent(parent_sets, ref_trail.add_mountain_before if mode == DrawMode.ADD_MOUNTAIN else ref_trail.add_empty_branch_before), cur_trail
-        elif isinstance(cur_trail, TrailSeries):
-            if mouse_pos in cur_trail.before_box and mode in [DrawMode.ADD_MOUNTAIN, DrawMode.ADD_BRANCH]:
-                return cur_trail.before_box, set_m(ref_trail, cur_trail.add_mountain_before if mode == DrawMode.ADD_MOUNTAIN else cur_trail.add_empty_branch_before), cur_trail
-            if mouse_pos in cur_trail.mountain_box and mode in [DrawMode.REMOVE, DrawMode.EDIT]:
-                return cur_trail.mountain_box, (set_m(ref_trail, cur_trail.remove_mountain) if mode == DrawMode.REMOVE else lambda: cur_trail.mountain), cur_trail
-            if mouse_pos in cur_trail.after_box and mode in [DrawMode.ADD_MOUNTAIN, DrawMode.ADD_BRANCH]:
-                return cur_trail.after_box, set_m(ref_trail, cur_trail.add_mountain_after if mode == DrawMode.ADD_MOUNTAIN else cur_trail.add_empty_branch_after), cur_trail
-            return self.box_and_action(mouse_pos, mode, cur_trail.following, (cur_trail, 'following'))
-        else:
-            if mouse_pos in cur_trail.branch_start_box and mode == DrawMode.REMOVE:
-                return cur_trail.branch_start_box, set_m(ref_trail, cur_trail.remove_branch), cur_trail
-            if mouse_pos in cur_trail.branch_end_box and mode == DrawMode.REMOVE:
-                return cur_trail.branch_end_box, set_m(ref_trail, cur_trail.remove_branch), cur_trail
-            if mouse_pos in cur_trail.path_bottom.trail_box:
-                return self.box_and_action(mouse_pos, mode, cur_trail.path_bottom, (cur_trail, 'path_bottom'))
-            if mouse_pos in cur_trail.path_top.trail_box:
-                return self.box_and_action(mouse_pos, mode, cur_trail.path_top, (cur_trail, 'path_top'))
-            return self.box_and_action(mouse_pos, mode, cur_trail.path_follow, (cur_trail, 'path_follow'))
-        return None, None, None
+        # Descend one subtrail at a time until something under the mouse is found.
+        while True:
+            cur_trail = ref_trail.store
+            if mouse_pos not in ref_trail.trail_box:
+                return None, None, None
+            if cur_trail is None:
+                if mode in [DrawMode.ADD_MOUNTAIN, DrawMode.ADD_BRANCH]:
+                    return ref_trail.trail_box, set_parent(parent_sets, ref_trail.add_mountain_before if mode == DrawMode.ADD_MOUNTAIN else ref_trail.add_empty_branch_before), cur_trail
+                return None, None, None
+            elif isinstance(cur_trail, TrailSeries):
+                if mouse_pos in cur_trail.before_box and mode in [DrawMode.ADD_MOUNTAIN, DrawMode.ADD_BRANCH]:
+                    return cur_trail.before_box, set_m(ref_trail, cur_trail.add_mountain_before if mode == DrawMode.ADD_MOUNTAIN else cur_trail.add_empty_branch_before), cur_trail
+                if mouse_pos in cur_trail.mountain_box and mode in [DrawMode.REMOVE, DrawMode.EDIT]:
+                    self.action_path = tuple(path)
+                    return cur_trail.mountain_box, (set_m(ref_trail, cur_trail.remove_mountain) if mode == DrawMode.REMOVE else lambda: cur_trail.mountain), cur_trail
+                if mouse_pos in cur_trail.after_box and mode in [DrawMode.ADD_MOUNTAIN, DrawMode.ADD_BRANCH]:
+                    return cur_trail.after_box, set_m(ref_trail, cur_trail.add_mountain_after if mode == DrawMode.ADD_MOUNTAIN else cur_trail.add_empty_branch_after), cur_trail
+                ref_trail, parent_sets = cur_trail.following, (cur_trail, 'following')
+                path.append('following')
+            else:
+                if mouse_pos in cur_trail.branch_start_box and mode == DrawMode.REMOVE:
+                    return cur_trail.branch_start_box, set_m(ref_trail, cur_trail.remove_branch), cur_trail
+                if mouse_pos in cur_trail.branch_end_box and mode == DrawMode.REMOVE:
+                    return cur_trail.branch_end_box, set_m(ref_trail, cur_trail.remove_branch), cur_trail
+                if mouse_pos in cur_trail.path_bottom.trail_box:
+                    ref_trail, parent_sets = cur_trail.path_bottom, (cur_trail, 'path_bottom')
+                    path.append('path_bottom')
+                elif mouse_pos in cur_trail.path_top.trail_box:
+                    ref_trail, parent_sets = cur_trail.path_top, (cur_trail, 'path_top')
+                    path.append('path_top')
+                else:
+                    ref_trail, parent_sets = cur_trail.path_follow, (cur_trail, 'path_follow')
+                    path.append('path_follow')
@@ -5,7 +5,7 @@ Requires no student import, but will use your implemented classes as part of it'
 
 import arcade
 import arcade.gui as gui
-import json
+import os
 import sys
 import secrets
 from copy import copy
@@ -13,11 +13,12 @@ from copy import copy
 from constants import DrawMode
 from mountain import Mountain
 from mountain_manager import MountainManager
-from trail import Trail, TrailSeries, TrailSplit
+from trail import Trail, TrailSeries, TrailSplit, trail_edited
 from draw_trails import TrailDraw
 from mountain_organiser import MountainOrganiser
 from double_key_table import DoubleKeyTable
-from serialize import serialize, deserialize
+from serialize import dump_file, load_file
+from trail_journal import JOURNAL_SUFFIX, TrailJournal
 
 class MyWindow(arcade.Window):
     """ Painter Window """
@@ -277,16 +278,22 @@ class MyWindow(arcade.Window):
         """Set up the game and initialize the variables."""
         self.reset()
         self.mountain_manager = MountainManager()
-        self.cur_filename = sys.argv[1] if len(sys.argv) > 1 else "basic.json"
-        with open(f"stores/{self.cur_filename}", "r") as f:
-            t = deserialize(json.loads(f.read()))
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        self.cur_filename = args[0] if args else "basic.json"
+        # Journaled stores save each edit as it's made, rather than rewriting the file.
+        self.journal = None
+        if "--journal" in sys.argv or os.path.exists(f"stores/{self.cur_filename}{JOURNAL_SUFFIX}"):
+            self.journal = TrailJournal(f"stores/{self.cur_filename}")
+            t = self.journal.load()
+        else:
+            t = load_file(f"stores/{self.cur_filename}")
         try:
             # Try to add all existing mountains
             for mountain in t.collect_all_mountains():
                 self.mountain_manager.add_mountain(mountain)
         except NotImplementedError:
             pass
-        self.mountain = TrailDraw(t)
+        self.mountain = TrailDraw(t, on_edit=self.journal.record if self.journal is not None else None)
         self.draw_box = None
 
     def on_draw(self) -> None:
@@ -353,6 +360,8 @@ class MyWindow(arcade.Window):
                         self.box_action()
                     elif self.cur_draw_mode == DrawMode.EDIT:
                         self.cur_editing_mountain = self.box_action()
+                        self.cur_editing_series = self.cur_trail
+                        self.cur_editing_path = self.mountain.action_path
                         self.input_mountain_name.text = self.cur_editing_mountain.name
                         self.input_difficulty_level.text = str(self.cur_editing_mountain.difficulty_level)
                         self.input_length.text = str(self.cur_editing_mountain.length)
@@ -449,6 +458,10 @@ class MyWindow(arcade.Window):
         self.cur_editing_mountain.name = self.input_mountain_name.text
         self.cur_editing_mountain.difficulty_level = int(self.input_difficulty_level.text)
         self.cur_editing_mountain.length = int(self.input_length.text)
+        # The mountain was changed in place, so cached walks may be out of date.
+        trail_edited(self.cur_editing_series)
+        if self.journal is not None:
+            self.journal.record(self.cur_editing_path, "edit", (self.cur_editing_mountain,))
         try:
             self.mountain_manager.edit_mountain(old_mountain, self.cur_editing_mountain)
         except NotImplementedError:
@@ -460,11 +473,15 @@ class MyWindow(arcade.Window):
         self.is_editing = False
         self.manager.disable()
         self.cur_editing_mountain = None
+        self.cur_editing_series = None
 
     def on_file_save_clicked(self, event):
         new_path = str(self.input_file_name.text)
-        with open(f"stores/{new_path}", "w") as f:
-            f.write(serialize(self.mountain.trail))
+        if self.journal is not None and new_path == self.cur_filename:
+            # Every edit is already in the journal.
+            self.journal.save()
+        else:
+            dump_file(self.mountain.trail, f"stores/{new_path}")
         # Close the window.
         self.on_file_close_clicked(event)
 
@@ -477,6 +494,8 @@ def main():
     window = MyWindow()
     window.setup()
     arcade.run()
+    if window.journal is not None:
+        window.journal.close()
 
 if __name__ == "__main__":
     main()
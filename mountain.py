@@ -1,9 +1,72 @@
 from __future__ import annotations
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True)
 class Mountain:
 
     name: str
     difficulty_level: int
     length: int
+
+
+@dataclass(frozen=True)
+class FrozenMountain:
+    """
+    An unchangeable Mountain, which can be hashed (in O(1), the hash is kept) and shared freely.
+    It has the same fields as Mountain, so it can be used anywhere a Mountain can be read.
+    """
+
+    __slots__ = ("name", "difficulty_level", "length", "_hash")
+
+    name: str
+    difficulty_level: int
+    length: int
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_hash", hash((self.name, self.difficulty_level, self.length)))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        # String hashes differ between processes, so recompute the hash rather than pickling it.
+        return FrozenMountain, (self.name, self.difficulty_level, self.length)
+
+    def thaw(self) -> Mountain:
+        """Returns a changeable copy."""
+        return Mountain(self.name, self.difficulty_level, self.length)
+
+
+class MountainInterner:
+    """
+    Hands out one shared mountain for each distinct (name, difficulty_level, length).
+
+    Call it like the Mountain constructor, or use `intern` on an existing mountain.
+    Mountains are made with `factory`, FrozenMountain by default. Shared mountains must not
+    be changed in place (it would change every use, and leave the table out of date),
+    so only pass Mountain for mountains that are never edited.
+    """
+
+    def __init__(self, factory: type[Mountain] | type[FrozenMountain] = FrozenMountain) -> None:
+        self.factory = factory
+        self.table: dict[tuple[str, int, int], Mountain | FrozenMountain] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of distinct mountains handed out."""
+        return len(self.table)
+
+    def __call__(self, name: str, difficulty_level: int, length: int) -> Mountain | FrozenMountain:
+        """
+        Returns the shared mountain with these fields, making it if needed.
+
+        :complexity: O(len(name)) to hash the name.
+        """
+        key = (name, difficulty_level, length)
+        mountain = self.table.get(key)
+        if mountain is None:
+            mountain = self.table[key] = self.factory(name, difficulty_level, length)
+        return mountain
+
+    def intern(self, mountain: Mountain | FrozenMountain) -> Mountain | FrozenMountain:
+        """Returns the shared mountain equal in fields to the given one."""
+        return self(mountain.name, mountain.difficulty_level, mountain.length)
@@ -1,14 +1,21 @@
-from mountain import Mountain
+from mountain import Mountain, MountainInterner
 
 class MountainManager:
 
-    def __init__(self) -> None:
+    def __init__(self, interner: MountainInterner | None = None) -> None:
+        # With an interner, duplicate mountains are stored as one shared object.
         self.mountains = []
+        self.interner = interner
 
     def add_mountain(self, mountain: Mountain):
+        if self.interner is not None:
+            mountain = self.interner.intern(mountain)
         self.mountains.append(mountain)
 
     def remove_mountain(self, mountain: Mountain):
+        if self.interner is not None:
+            # The stored mountain may be of another type, e.g. a FrozenMountain, which never equals a Mountain.
+            mountain = self.interner.intern(mountain)
         self.mountains.remove(mountain)
 
     def edit_mountain(self, old: Mountain, new: Mountain):
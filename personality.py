@@ -1,30 +1,51 @@
 from abc import ABC, abstractmethod
 from mountain import Mountain
 from trail import Trail
+from typing import Iterable
 
 class WalkerPersonality(ABC):
 
+    # Set this to True if select_branch only depends on the branches it is given (anywhere in them).
+    # Walks by deterministic personalities are cached on the trail until anything in it changes,
+    # and replayed through add_mountains, so they should record mountains with the methods below.
+    DETERMINISTIC = False
+    # Set this to True as well if select_branch only reads the first store of each branch.
+    # Cached walks then only depend on what the walk reached, and leave lazy trails unread past it.
+    SHALLOW = False
+
     def __init__(self) -> None:
         self.mountains = []
 
     def add_mountain(self, mountain: Mountain) -> None:
         self.mountains.append(mountain)
 
+    def add_mountains(self, mountains: Iterable[Mountain]) -> None:
+        self.mountains.extend(mountains)
+
     @abstractmethod
     def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
         raise NotImplementedError()
 
 class TopWalker(WalkerPersonality):
+    DETERMINISTIC = True
+    SHALLOW = True
+
     def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
         # Always select the top branch
         return True
 
 class BottomWalker(WalkerPersonality):
+    DETERMINISTIC = True
+    SHALLOW = True
+
     def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
         # Always select the bottom branch
         return False
 
 class LazyWalker(WalkerPersonality):
+    DETERMINISTIC = True
+    SHALLOW = True
+
     def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
         """
         Try looking into the first mountain on each branch,
@@ -1,6 +1,8 @@
-import dataclasses, json
+import dataclasses, gzip, json, lzma, os, re
+from typing import Callable
+from json.encoder import encode_basestring_ascii
 
-from trail import Trail, TrailSplit, TrailSeries
+from trail import Trail, TrailSplit, TrailSeries, TrailStore
 from mountain import Mountain
 
 # https://stackoverflow.com/questions/51286748/make-the-python-json-encoder-support-pythons-new-dataclasses
@@ -26,18 +28,320 @@ class EnhancedJSONEncoder(json.JSONEncoder):
 def serialize(trail):
     return json.dumps(trail, cls=EnhancedJSONEncoder)
 
-def deserialize(obj):
-    if obj["store"] is None:
-        return Trail(None)
-    if "mountain" in obj["store"]:
-        inside = TrailSeries(
-            Mountain(**obj["store"]["mountain"]),
-            deserialize(obj["store"]["following"])
-        )
-    else:
-        inside = TrailSplit(
-            deserialize(obj["store"]["path_top"]),
-            deserialize(obj["store"]["path_bottom"]),
-            deserialize(obj["store"]["path_follow"])
-        )
-    return Trail(inside)
+
+def _encode_scalar(value) -> str:
+    """Encodes a mountain field exactly as `json.dumps` would."""
+    if type(value) is int:
+        return int.__repr__(value)
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+def dump(trail: Trail, fp, flush_every: int = 4096, extra: dict | None = None) -> None:
+    """
+    Writes the trail to a text file object, with the same output as `serialize`.
+    Any `extra` keys are written next to the top level "store", and can be read back with `load`.
+
+    Walks the trail once with an explicit stack, writing each node as it is reached.
+    Nothing is copied, drawing boxes are never written, and text is written in
+    batches of `flush_every` pieces rather than built up as one string.
+
+    :complexity: O(N) where N is the number of trail nodes.
+    """
+    pieces = []
+    # Text and trails still to write, in reverse order.
+    stack = []
+
+    def write_store(store: TrailStore) -> None:
+        """Writes the start of a store, and queues up the rest of it."""
+        if store is None:
+            pieces.append('null')
+        elif isinstance(store, TrailSeries):
+            mountain = store.mountain
+            pieces.append(
+                '{"mountain": {"name": ' + _encode_scalar(mountain.name) +
+                ', "difficulty_level": ' + _encode_scalar(mountain.difficulty_level) +
+                ', "length": ' + _encode_scalar(mountain.length) +
+                '}, "following": '
+            )
+            stack.append('}')
+            stack.append(store.following)
+        else:
+            pieces.append('{"path_top": ')
+            stack.append('}')
+            stack.append(store.path_follow)
+            stack.append(', "path_follow": ')
+            stack.append(store.path_bottom)
+            stack.append(', "path_bottom": ')
+            stack.append(store.path_top)
+
+    pieces.append('{"store": ')
+    stack.append("".join(", " + json.dumps(key) + ": " + json.dumps(value) for key, value in (extra or {}).items()) + "}")
+    write_store(trail.store)
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            pieces.append(item)
+        else:
+            pieces.append('{"store": ')
+            stack.append('}')
+            write_store(item.store)
+        if len(pieces) >= flush_every:
+            fp.write("".join(pieces))
+            pieces.clear()
+    fp.write("".join(pieces))
+
+
+def deserialize(obj, make_mountain: Callable[..., Mountain] = Mountain):
+    # Mountains are made with `make_mountain`, pass a MountainInterner to share duplicates.
+    # Trails are built bottom up with an explicit stack, so deep trails don't hit the recursion limit.
+    # Finished subtrails wait in `built`, keyed by the id of their dict, until their parent is made.
+    built = {}
+    stack = [obj]
+    while stack:
+        cur = stack[-1]
+        store = cur["store"]
+        if store is None:
+            built[id(cur)] = Trail(None)
+            stack.pop()
+            continue
+        if "mountain" in store:
+            children = [store["following"]]
+        else:
+            children = [store["path_top"], store["path_bottom"], store["path_follow"]]
+        missing = [child for child in children if id(child) not in built]
+        if missing:
+            stack.extend(missing)
+            continue
+        stack.pop()
+        if "mountain" in store:
+            inside = TrailSeries(
+                make_mountain(**store["mountain"]),
+                built.pop(id(children[0]))
+            )
+        else:
+            inside = TrailSplit(*(built.pop(id(child)) for child in children))
+        built[id(cur)] = Trail(inside)
+    return built[id(obj)]
+
+
+# One JSON token, after any whitespace.
+# Mountains are by far the most common object, so they are matched whole as a shortcut.
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<mountain>\{\s*"name"\s*:\s*"(?P<name>(?:[^"\\]|\\.)*)"\s*,
+            \s*"difficulty_level"\s*:\s*(?P<difficulty_level>-?\d+)\s*,
+            \s*"length"\s*:\s*(?P<length>-?\d+)\s*\})
+      | (?P<punct>[{}\[\]:,])
+      | "(?P<string>(?:[^"\\]|\\.)*)"
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<literal>null|true|false)
+    )''', re.VERBOSE)
+
+_LITERALS = {"null": None, "true": True, "false": False}
+
+# What may be left at the end of a chunk when no token matches there, but one could once more is read:
+# whitespace, or the start of a string, number or literal.
+_PARTIAL = re.compile(r'\s*(?:"(?:[^"\\]|\\.)*\\?|-|n(?:ul?)?|t(?:ru?)?|f(?:a(?:ls?)?)?)?\Z')
+# The end of a chunk cutting a number off before its fraction or exponent.
+_NUMBER_CUT = re.compile(r'(?:\.|[eE][+-]?)\Z')
+
+
+_SERIES_KEYS = frozenset({"mountain", "following"})
+_SPLIT_KEYS = frozenset({"path_top", "path_bottom", "path_follow"})
+_MOUNTAIN_KEYS = frozenset({"name", "difficulty_level", "length"})
+# Values that can't be a mountain made while loading.
+_NOT_MOUNTAINS = (list, str, int, float, type(None), Trail, TrailSeries, TrailSplit)
+
+# What an open object or array expects next.
+_KEY_OR_END, _KEY, _COLON, _VALUE, _VALUE_OR_END, _COMMA_OR_END = range(6)
+
+
+def _build(obj: dict, make_mountain: Callable[..., Mountain], top_level: bool = False):
+    """
+    Turns a finished JSON object into the trail piece it describes, or leaves it as a dict
+    if its keys aren't a trail's, series' or split's. Only the top level trail may have other keys.
+
+    :raises ValueError: when a trail, series or split holds something of the wrong type.
+    """
+    keys = obj.keys()
+    if "store" in obj and (top_level or len(obj) == 1):
+        store = obj["store"]
+        if store is not None and not isinstance(store, (TrailSeries, TrailSplit)):
+            raise ValueError(f"Trail file has a store that isn't a series or split: {store!r}")
+        return Trail(store)
+    if keys == _SERIES_KEYS:
+        mountain, following = obj["mountain"], obj["following"]
+        if isinstance(mountain, dict):
+            if mountain.keys() != _MOUNTAIN_KEYS or type(mountain["name"]) is not str \
+                    or type(mountain["difficulty_level"]) is not int or type(mountain["length"]) is not int:
+                raise ValueError(f"Trail file has a malformed mountain: {mountain!r}")
+            mountain = make_mountain(**mountain)
+        elif isinstance(mountain, _NOT_MOUNTAINS):
+            raise ValueError(f"Trail file has a malformed mountain: {mountain!r}")
+        if not isinstance(following, Trail):
+            raise ValueError(f"Trail file has a series followed by something other than a trail: {following!r}")
+        return TrailSeries(mountain, following)
+    if keys == _SPLIT_KEYS:
+        paths = (obj["path_top"], obj["path_bottom"], obj["path_follow"])
+        if not all(isinstance(path, Trail) for path in paths):
+            raise ValueError("Trail file has a split with a path that isn't a trail")
+        return TrailSplit(*paths)
+    if keys & (_SERIES_KEYS | _SPLIT_KEYS):
+        raise ValueError(f"Trail file has a series or split with the wrong keys: {sorted(keys)}")
+    return obj
+
+
+def load(fp, chunk_size: int = 1 << 16, extra: dict | None = None, make_mountain: Callable[..., Mountain] = Mountain) -> Trail:
+    """
+    Reads a trail from a text file object holding `serialize` output.
+    If `extra` is given, it is filled with any top level keys other than "store".
+    Mountains are made with `make_mountain`, pass a MountainInterner to share duplicates.
+
+    The file is read in chunks and each object is turned into a Trail, TrailSeries or TrailSplit
+    as soon as it is closed, so only the objects still open along the current branch are held as dicts.
+    Uses an explicit stack, so arbitrarily deep trails are fine.
+
+    This isn't faster than `deserialize(json.load(fp))`. What it saves is memory: that holds the
+    whole text and every parsed dict alongside the trail, while this only holds one chunk and the
+    objects still open, O(chunk_size + D) on top of the trail where D is the depth of the trail.
+
+    :raises ValueError: when the file is not valid trail JSON, as soon as the data read can't be.
+    :complexity: O(S) where S is the size of the file.
+    """
+    # Objects and arrays still open, each with the key waiting for a value (for objects),
+    # and what is expected next.
+    stack: list[list] = []
+    result = None
+    done = False
+
+    def expect_value() -> None:
+        if not stack:
+            if done:
+                raise ValueError("Trail file has more than one value")
+        elif stack[-1][2] != _VALUE and stack[-1][2] != _VALUE_OR_END:
+            raise ValueError("Trail file has a value where a key or separator belongs")
+
+    def add(value) -> None:
+        nonlocal result, done
+        expect_value()
+        if not stack:
+            result = value
+            done = True
+            return
+        top = stack[-1]
+        if top[1] is not None:
+            top[0][top[1]] = value
+            top[1] = None
+        else:
+            top[0].append(value)
+        top[2] = _COMMA_OR_END
+
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        match = _TOKEN.match(buffer, pos)
+        # A token that touches the end of the buffer may continue in the next chunk.
+        if match is None or (not eof and (match.end() == len(buffer) or (
+                match.lastgroup == "number" and _NUMBER_CUT.match(buffer, match.end())))):
+            if eof or (match is None and _PARTIAL.match(buffer, pos) is None):
+                # Nothing read later could make this a token.
+                if buffer[pos:].strip():
+                    raise ValueError(f"Unexpected data in trail file: {buffer[pos:].lstrip()[:20]!r}")
+                break
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        pos = match.end()
+
+        if match.group("mountain") is not None:
+            name = match.group("name")
+            if "\\" in name:
+                name = json.loads(f'"{name}"')
+            difficulty_level, length = int(match.group("difficulty_level")), int(match.group("length"))
+            if len(stack) > 1 and stack[-1][1] == "mountain":
+                add(make_mountain(name, difficulty_level, length))
+            else:
+                # Only a series holds mountains, anything else with these keys stays a dict.
+                add({"name": name, "difficulty_level": difficulty_level, "length": length})
+            continue
+
+        punct = match.group("punct")
+        if punct == "{":
+            expect_value()
+            stack.append([{}, None, _KEY_OR_END])
+        elif punct == "[":
+            expect_value()
+            stack.append([[], None, _VALUE_OR_END])
+        elif punct == "}" or punct == "]":
+            if not stack or isinstance(stack[-1][0], dict) != (punct == "}") \
+                    or stack[-1][2] not in (_KEY_OR_END, _VALUE_OR_END, _COMMA_OR_END):
+                raise ValueError(f"Unexpected {punct} in trail file")
+            container = stack.pop()[0]
+            if punct == "]":
+                add(container)
+                continue
+            if not stack and extra is not None:
+                extra.update((key, value) for key, value in container.items() if key != "store")
+            add(_build(container, make_mountain, not stack))
+        elif punct == ":":
+            if not stack or stack[-1][2] != _COLON:
+                raise ValueError("Unexpected : in trail file")
+            stack[-1][2] = _VALUE
+        elif punct == ",":
+            if not stack or stack[-1][2] != _COMMA_OR_END:
+                raise ValueError("Unexpected , in trail file")
+            stack[-1][2] = _KEY if isinstance(stack[-1][0], dict) else _VALUE
+        elif match.group("string") is not None:
+            value = match.group("string")
+            if "\\" in value:
+                value = json.loads(f'"{value}"')
+            if stack and (stack[-1][2] == _KEY_OR_END or stack[-1][2] == _KEY):
+                stack[-1][1] = value
+                stack[-1][2] = _COLON
+            else:
+                add(value)
+        elif match.group("number") is not None:
+            add(json.loads(match.group("number")))
+        else:
+            add(_LITERALS[match.group("literal")])
+
+    if stack or not done:
+        raise ValueError("Trail file ended early")
+    if not isinstance(result, Trail):
+        raise ValueError("Trail file does not hold a trail")
+    return result
+
+
+# Compression for store files, chosen by their extension.
+COMPRESSED_EXTENSIONS = {".gz": gzip.open, ".xz": lzma.open, ".lzma": lzma.open}
+
+
+def open_store(path: str, mode: str = "r"):
+    """
+    Opens a store file as text ("r" or "w"), compressed with gzip for .gz or lzma for .xz and .lzma.
+    Compression is streamed, so neither the file nor its JSON is ever held in memory whole.
+    """
+    opener = COMPRESSED_EXTENSIONS.get(os.path.splitext(path)[1])
+    if opener is None:
+        return open(path, mode, encoding="utf-8")
+    if opener is gzip.open:
+        # Level 6 compresses repetitive JSON nearly as well as 9, in much less time.
+        return gzip.open(path, mode + "t", compresslevel=6, encoding="utf-8")
+    return opener(path, mode + "t", encoding="utf-8")
+
+
+def load_file(path: str, **kwargs) -> Trail:
+    """Reads a trail from a (possibly compressed) store file, see `load` for the options."""
+    with open_store(path, "r") as f:
+        return load(f, **kwargs)
+
+
+def dump_file(trail: Trail, path: str, **kwargs) -> None:
+    """Writes a trail to a (possibly compressed) store file, see `dump` for the options."""
+    with open_store(path, "w") as f:
+        dump(trail, f, **kwargs)
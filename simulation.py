@@ -0,0 +1,67 @@
+"""
+Runs many walkers over the same trail, spread across processes.
+"""
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+
+from compiled_trail import CompiledTrail
+from personality import WalkerPersonality
+from trail import Trail
+
+# The trail walked by this worker process, sent once when the process starts.
+_worker_trail: CompiledTrail | None = None
+
+
+def _init_worker(compiled: CompiledTrail) -> None:
+    global _worker_trail
+    _worker_trail = compiled
+
+
+def _run_shard(personality: type[WalkerPersonality], walkers: int, seed: int | None) -> Counter:
+    """Walks the worker's trail with `walkers` new personalities and counts visits by mountain name."""
+    # Forked workers start with the same random state, so each shard reseeds.
+    random.seed(seed)
+    visits = Counter()
+    for _ in range(walkers):
+        walker = personality()
+        _worker_trail.follow_path(walker)
+        visits.update(mountain.name for mountain in walker.mountains)
+    return visits
+
+
+def simulate_walkers(
+    trail: Trail,
+    personality: type[WalkerPersonality],
+    walkers: int,
+    workers: int | None = None,
+    seed: int | None = None,
+) -> dict[str, int]:
+    """
+    Sends `walkers` new personalities down the trail, split evenly over `workers` processes,
+    and returns how many times each mountain (by name) was visited.
+
+    `personality` is called with no arguments to make each walker, and must be picklable
+    (a class defined at module level). Each worker receives the trail once, as a
+    CompiledTrail, and then runs a single shard of walkers.
+    Passing a seed makes runs with the same number of workers repeatable.
+
+    :complexity: O(W * P / workers) wall time, where W is walkers and P the cost of one walk.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, walkers))
+    compiled = CompiledTrail(trail)
+    shard_sizes = [walkers // workers + (i < walkers % workers) for i in range(workers)]
+
+    visits = Counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compiled,)) as pool:
+        shards = [
+            pool.submit(_run_shard, personality, size, None if seed is None else seed + i)
+            for i, size in enumerate(shard_sizes)
+        ]
+        for shard in shards:
+            visits.update(shard.result())
+    return dict(visits)
@@ -0,0 +1,29 @@
+"""
+Trails shared by several test modules, and by benchmark.py.
+"""
+import random
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit
+
+
+def generate_trail(mountains: int, seed: int = 0) -> Trail:
+    """
+    Makes a trail with about the given number of mountains, with random difficulties and lengths.
+    Splits are nested evenly, so the trail stays shallow.
+    """
+    rng = random.Random(seed)
+    count = 0
+
+    def build(size: int) -> Trail:
+        nonlocal count
+        if size <= 8:
+            trail = Trail(None)
+            for _ in range(size):
+                count += 1
+                trail = Trail(TrailSeries(Mountain(f"mountain-{count}", rng.randint(0, 9), rng.randint(1, 20)), trail))
+            return trail
+        third = size // 3
+        return Trail(TrailSplit(build(third), build(third), build(size - 2 * third)))
+
+    return build(mountains)
@@ -0,0 +1,101 @@
+import gc
+import os
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit
+from serialize import load
+from personality import TopWalker
+from binary_store import BinaryTrailStore, LazyTrail, convert_json_to_binary, dump_binary, load_binary, open_binary, SERIES
+
+class TestBinaryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "trail.trlb")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @number("12.1")
+    def test_convert(self):
+        convert_json_to_binary("stores/basic.json", self.path)
+        with open("stores/basic.json") as f:
+            expected = load(f)
+        self.assertEqual(load_binary(self.path), expected)
+        self.assertLess(os.path.getsize(self.path), os.path.getsize("stores/basic.json"))
+
+        with BinaryTrailStore(self.path) as store:
+            kind, mountain, _, following = store.node(0)
+            self.assertEqual(kind, SERIES)
+            self.assertEqual(store.mountain(mountain), expected.store.mountain)
+            self.assertEqual(following, 1)
+
+    @number("12.2")
+    def test_shared(self):
+        shared = Trail(TrailSeries(Mountain("sé", 1, 2), Trail(None)))
+        trail = Trail(TrailSplit(
+            Trail(TrailSplit(Trail(None), Trail(None), shared)),
+            shared,
+            Trail(TrailSeries(Mountain("sé", 1, 2), Trail(None))),
+        ))
+        with open(self.path, "wb") as f:
+            dump_binary(trail, f)
+        with BinaryTrailStore(self.path) as store:
+            # Shared subtrails and identical mountains are stored once.
+            self.assertEqual(len(store), 8)
+            self.assertEqual(store.mountain_count, 1)
+        result = load_binary(self.path)
+        self.assertEqual(result, trail)
+        self.assertIs(result.store.path_bottom, result.store.path_top.store.path_follow)
+
+    @number("12.3")
+    def test_bad_file(self):
+        for data in [b"", b"TRLB", b"{\"store\": null}" * 4]:
+            with open(self.path, "wb") as f:
+                f.write(data)
+            self.assertRaises(ValueError, lambda: BinaryTrailStore(self.path))
+
+    @number("12.4")
+    def test_open_binary(self):
+        convert_json_to_binary("stores/basic.json", self.path)
+        with open("stores/basic.json") as f:
+            expected = load(f)
+        trail = open_binary(self.path)
+        self.assertIsInstance(trail, LazyTrail)
+        self.assertFalse(trail.resolved)
+        # Still readable after the function that opened it is done.
+        self.assertEqual(trail, expected)
+        # Building the whole trail leaves the garbage collector as it was.
+        self.assertTrue(gc.isenabled())
+        load_binary(self.path)
+        self.assertTrue(gc.isenabled())
+        gc.disable()
+        try:
+            load_binary(self.path)
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+
+    @number("15.1")
+    def test_lazy(self):
+        convert_json_to_binary("stores/basic.json", self.path)
+        with open("stores/basic.json") as f:
+            expected = load(f)
+        with BinaryTrailStore(self.path) as store:
+            trail = store.lazy_trail()
+            self.assertIsInstance(trail, LazyTrail)
+            self.assertEqual(len(store.lazy_trails), 1)
+
+            walker, expected_walker = TopWalker(), TopWalker()
+            trail.follow_path(walker)
+            expected.follow_path(expected_walker)
+            self.assertListEqual(walker.mountains, expected_walker.mountains)
+            # Only the nodes the walk reached (and the branches it was shown) were read.
+            self.assertLess(sum(lazy.resolved for lazy in store.lazy_trails.values()), len(store))
+
+            self.assertEqual(trail, expected)
+            self.assertTrue(all(lazy.resolved for lazy in store.lazy_trails.values()))
+            self.assertEqual(len(store.lazy_trails), len(store))
@@ -0,0 +1,80 @@
+import ast
+import csv
+import os
+import struct
+import tempfile
+import unittest
+from array import array
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from mountain_manager import MountainManager
+from trail import Trail, TrailSeries, TrailSplit
+from compiled_trail import CompiledTrail
+from columnar_export import TrailColumns, BOTTOM, FOLLOW, FOLLOWING, ROOT, TOP
+
+class TestColumnarExport(unittest.TestCase):
+
+    def load_example(self):
+        self.trail = Trail(TrailSeries(Mountain("a", 1, 2), Trail(TrailSplit(
+            Trail(TrailSeries(Mountain("b", 3, 4), Trail(None))),
+            Trail(None),
+            Trail(TrailSeries(Mountain("a", 5, 6), Trail(None))),
+        ))))
+
+    def read_npy(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        self.assertEqual(data[:8], b"\x93NUMPY\x01\x00")
+        (header_length,) = struct.unpack("<H", data[8:10])
+        self.assertEqual((10 + header_length) % 64, 0)
+        header = ast.literal_eval(data[10:10 + header_length].decode("latin1"))
+        return header, data[10 + header_length:]
+
+    @number("20.1")
+    def test_columns(self):
+        self.load_example()
+        columns = TrailColumns.from_trail(self.trail)
+        self.assertListEqual(columns.names, ["a", "b"])
+        self.assertEqual(columns.name, array("i", [0, 1, 0]))
+        self.assertEqual(columns.difficulty_level, array("i", [1, 3, 5]))
+        self.assertEqual(columns.length, array("i", [2, 4, 6]))
+        # Nodes: a, split, b, empty (b's following), empty (bottom), a, empty.
+        self.assertEqual(columns.kind, array("b", [
+            CompiledTrail.SERIES, CompiledTrail.SPLIT, CompiledTrail.SERIES, CompiledTrail.EMPTY,
+            CompiledTrail.EMPTY, CompiledTrail.SERIES, CompiledTrail.EMPTY,
+        ]))
+        self.assertEqual(columns.parent, array("i", [-1, 0, 1, 2, 1, 1, 5]))
+        self.assertEqual(columns.branch, array("b", [ROOT, FOLLOWING, TOP, FOLLOWING, BOTTOM, FOLLOW, FOLLOWING]))
+        self.assertEqual(columns.mountain, array("i", [0, -1, 1, -1, -1, 2, -1]))
+
+        manager = MountainManager()
+        for mountain in self.trail.collect_all_mountains():
+            manager.add_mountain(mountain)
+        from_manager = TrailColumns.from_mountains(manager.mountains)
+        self.assertEqual(from_manager.length, columns.length)
+        self.assertEqual(len(from_manager.kind), 0)
+
+    @number("20.2")
+    def test_write(self):
+        self.load_example()
+        columns = TrailColumns.from_trail(self.trail)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = columns.write_csv(directory)
+            self.assertListEqual([os.path.basename(path) for path in paths], ["mountains.csv", "nodes.csv"])
+            with open(paths[0], newline="") as f:
+                self.assertListEqual(list(csv.reader(f)), [
+                    ["name", "difficulty_level", "length"], ["a", "1", "2"], ["b", "3", "4"], ["a", "5", "6"],
+                ])
+
+            paths = columns.write_npy(directory)
+            self.assertEqual(len(paths), 8)
+            header, data = self.read_npy(os.path.join(directory, "mountains.length.npy"))
+            self.assertEqual(header, {"descr": "<i4", "fortran_order": False, "shape": (3,)})
+            self.assertEqual(struct.unpack("<3i", data), (2, 4, 6))
+            header, data = self.read_npy(os.path.join(directory, "nodes.kind.npy"))
+            self.assertEqual(header["descr"], "|i1")
+            self.assertEqual(data, bytes(columns.kind))
+            header, data = self.read_npy(os.path.join(directory, "names.npy"))
+            self.assertEqual(header["descr"], "<U1")
+            self.assertEqual(data.decode("utf-32-le"), "ab")
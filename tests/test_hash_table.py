@@ -0,0 +1,279 @@
+import random
+import unittest
+from ed_utils.decorators import number
+
+from data_structures.hash_table import FullError, LinearProbeTable, RobinHoodTable
+
+class TestHashTable(unittest.TestCase):
+
+    def random_operations(self, table, operations=3000, keys=300, seed=0):
+        """Applies random sets and deletes to the table and a dict, checking they agree."""
+        rng = random.Random(seed)
+        expected = {}
+        for _ in range(operations):
+            key = f"mountain-{rng.randrange(keys)}"
+            if key in expected and rng.random() < 0.4:
+                del table[key]
+                del expected[key]
+            else:
+                expected[key] = rng.random()
+                table[key] = expected[key]
+            self.assertEqual(len(table), len(expected))
+        for key, value in expected.items():
+            self.assertEqual(table[key], value)
+            self.assertIn(key, table)
+        self.assertCountEqual(table.keys(), expected.keys())
+        self.assertCountEqual(table.values(), expected.values())
+        self.assertNotIn("missing", table)
+        self.assertRaises(KeyError, lambda: table["missing"])
+        return expected
+
+    def check_distances(self, table):
+        for position in range(table.table_size):
+            if table.occupied[position]:
+                distance = table.distance_array[position]
+                self.assertEqual(distance, (position - table.hash(table.key_array[position])) % table.table_size)
+                # Robin Hood order: an entry is at most one further from home than the one before it.
+                if distance > 0:
+                    self.assertLessEqual(distance, table.distance_array[position - 1] + 1)
+
+    @number("21.1")
+    def test_tables(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            self.random_operations(table_type())
+            # A poor hash makes long clusters.
+            table = table_type()
+            table.hash = lambda key: len(key) % table.table_size
+            self.random_operations(table, operations=600, keys=60, seed=1)
+
+    @number("21.2")
+    def test_robin_hood(self):
+        table = RobinHoodTable()
+        self.random_operations(table)
+        self.check_distances(table)
+
+        # Without resizing, at high load.
+        table = RobinHoodTable(sizes=[53])
+        hashed = []
+        table.full_hash = lambda key: hashed.append(key) or RobinHoodTable.full_hash(table, key)
+        self.random_operations(table, operations=2000, keys=50, seed=2)
+        self.check_distances(table)
+        for key in list(table.keys()):
+            hashed.clear()
+            del table[key]
+            # Only the deleted key is hashed, the cluster behind it is shifted back.
+            self.assertListEqual(hashed, [key])
+            self.check_distances(table)
+        self.assertTrue(table.is_empty())
+
+        table = RobinHoodTable(sizes=[5])
+        for i in range(5):
+            table[str(i)] = i
+        self.assertTrue(table.is_full())
+        self.assertRaises(FullError, lambda: table.__setitem__("5", 5))
+        self.assertRaises(KeyError, lambda: table["5"])
+
+    @number("22.1")
+    def test_kept_hashes(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            table = table_type()
+            hashed = []
+            table.full_hash = lambda key: hashed.append(key) or table_type.full_hash(table, key)
+            keys = [f"a long mountain name number {i}" for i in range(2000)]
+            for key in keys:
+                table[key] = len(key)
+            # Every key was hashed once, on insert, even though the table was resized many times.
+            self.assertEqual(len(hashed), len(keys))
+            self.assertGreater(table.size_index, 5)
+            for key in keys[::2]:
+                del table[key]
+            self.assertEqual(len(hashed), len(keys) + len(keys) // 2)
+            for key in keys[1::2]:
+                self.assertEqual(table[key], len(key))
+            self.assertEqual(table.full_hash("abc"), table_type.full_hash(table_type(), "abc"))
+
+    @number("22.2")
+    def test_hash_checked_first(self):
+        comparisons = 0
+
+        class CountingKey(str):
+            def __eq__(self, other):
+                nonlocal comparisons
+                comparisons += 1
+                return str.__eq__(self, other)
+            __hash__ = str.__hash__
+
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            # Kept small so clusters are long.
+            table = table_type(sizes=[97])
+            keys = [CountingKey(f"mountain-{i}") for i in range(80)]
+            for i, key in enumerate(keys):
+                table[key] = i
+            comparisons = 0
+            for i, key in enumerate(keys):
+                self.assertEqual(table[key], i)
+            # Keys are only compared when their hashes match.
+            self.assertEqual(comparisons, len(keys))
+            self.assertNotIn(CountingKey("missing"), table)
+            self.assertEqual(comparisons, len(keys))
+
+    @number("23.1")
+    def test_parallel_arrays(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            table = table_type()
+            for i in range(20):
+                table[str(i)] = i
+            self.assertIsInstance(table.occupied, bytearray)
+            self.assertEqual(sum(table.occupied), len(table))
+            storage = (table.key_array, table.value_array, table.hash_array, table.occupied)
+            # Updates overwrite values in place.
+            for i in range(20):
+                table[str(i)] = -i
+            self.assertTrue(all(a is b for a, b in zip(storage, (table.key_array, table.value_array, table.hash_array, table.occupied))))
+            self.assertEqual(sorted(table.values()), list(range(-19, 1)))
+            # Deleted slots don't hold on to their keys or values.
+            for i in range(20):
+                del table[str(i)]
+            self.assertEqual(sum(table.occupied), 0)
+            self.assertTrue(all(table.key_array[p] is None and table.value_array[p] is None for p in range(table.table_size)))
+
+    @number("24.1")
+    def test_reserve(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            table = table_type()
+            table["a"] = 1
+            table.reserve(1000)
+            self.assertEqual(table.table_size, 3079)
+            self.assertEqual(table["a"], 1)
+            resizes = 0
+            resize = table._resize
+
+            def counting_resize(size_index):
+                nonlocal resizes
+                resizes += 1
+                resize(size_index)
+            table._resize = counting_resize
+            for i in range(999):
+                table[str(i)] = i
+            self.assertEqual(resizes, 0)
+            # Never shrinks, and stops at the largest size.
+            table.reserve(10)
+            self.assertEqual(table.table_size, 3079)
+            table.reserve(10 ** 9)
+            self.assertEqual(table.table_size, table.TABLE_SIZES[-1])
+            self.assertEqual(len(table), 1000)
+
+    @number("24.2")
+    def test_bulk_insert(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            expected = {f"mountain-{i}": i for i in range(500)}
+            for items in [expected, list(expected.items()), iter(expected.items())]:
+                table = table_type.from_items(items)
+                self.assertIsInstance(table, table_type)
+                self.assertEqual(table.table_size, 1543)
+                self.assertEqual(dict(zip(table.keys(), table.values())), expected)
+            # Existing keys are updated.
+            table.update([("mountain-0", -1), ("new", 7)])
+            self.assertEqual((table["mountain-0"], table["new"], len(table)), (-1, 7, 501))
+            # When the sizes run out, the table is filled past half, then is full.
+            table = table_type.from_items([(str(i), i) for i in range(4)], sizes=[5])
+            self.assertEqual(len(table), 4)
+            with self.assertRaises(FullError):
+                table.update([(str(i), i) for i in range(4, 7)])
+
+    @number("25.1")
+    def test_incremental_resize(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            table = table_type(incremental=True)
+            expected = self.random_operations(table, operations=5000, keys=2000, seed=1)
+            # Checked again part way through a resize, then once it is finished.
+            while table.old_occupied is None:
+                expected[str(len(expected))] = len(expected)
+                table[str(len(expected) - 1)] = len(expected) - 1
+            self.assertCountEqual(table.keys(), expected.keys())
+            self.assertCountEqual(table.values(), expected.values())
+            for key, value in expected.items():
+                self.assertEqual(table[key], value)
+            table._finish_resize()
+            self.assertIsNone(table.old_occupied)
+            self.assertCountEqual(table.keys(), expected.keys())
+            if table_type is RobinHoodTable:
+                self.check_distances(table)
+
+    @number("25.2")
+    def test_incremental_resize_is_bounded(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            table = table_type(incremental=True)
+            placed = 0
+            place = table._place
+
+            def counting_place(key, data, key_hash):
+                nonlocal placed
+                placed += 1
+                place(key, data, key_hash)
+            table._place = counting_place
+            resizes = 0
+            for i in range(20000):
+                placed = 0
+                size = table.table_size
+                table[str(i)] = i
+                # Each insert moves at most MIGRATE_STEPS old entries across.
+                self.assertLessEqual(placed, table.MIGRATE_STEPS)
+                if table.table_size != size:
+                    resizes += 1
+                    self.assertIsNotNone(table.old_occupied)
+                    # Mid resize, keys are found in either array, and can be updated and deleted.
+                    self.assertEqual(table["0"], 0)
+                    table["0"] = 0
+                    del table["1"]
+                    table["1"] = 1
+                    self.assertCountEqual(table.keys(), [str(j) for j in range(i + 1)])
+                    self.assertEqual(len(table), i + 1)
+            self.assertEqual(resizes, 13)
+            for i in range(20000):
+                self.assertEqual(table[str(i)], i)
+            # A table with its hash replaced resizes all at once.
+            table = table_type(incremental=True)
+            table.hash = lambda key: len(key) % table.table_size
+            for i in range(100):
+                table[str(i)] = i
+                self.assertIsNone(table.old_occupied)
+
+    @number("25.3")
+    def test_incremental_resize_storage_is_prepared(self):
+        for table_type in [LinearProbeTable, RobinHoodTable]:
+            table = table_type(incremental=True)
+            filled = 0
+            fill = table._fill_arrays
+
+            def counting_fill(arrays, start, end):
+                nonlocal filled
+                filled += end - start
+                fill(arrays, start, end)
+            table._fill_arrays = counting_fill
+            resizes = 0
+            for i in range(20000):
+                filled = 0
+                size = table.table_size
+                prepared = table.prepared
+                table[str(i)] = i
+                # Each insert empties at most PREPARE_STEPS slots of the next size's arrays.
+                self.assertLessEqual(filled, table.PREPARE_STEPS)
+                if table.table_size != size:
+                    resizes += 1
+                if table.table_size != size and table.table_size > table.PREPARE_STEPS:
+                    # The resize took the storage prepared by earlier inserts.
+                    self.assertIsNotNone(prepared)
+                    self.assertEqual(prepared[1], table.table_size)
+                    self.assertIs(table.key_array, prepared[2][0])
+                    self.assertIs(table.occupied, prepared[2][3])
+                    self.assertEqual(len(table.hash_array), table.table_size)
+                    if table_type is RobinHoodTable:
+                        self.assertEqual(len(table.distance_array), table.table_size)
+                    for position in range(table.table_size):
+                        if not table.occupied[position]:
+                            self.assertIsNone(table.key_array[position])
+                            self.assertIsNone(table.value_array[position])
+            self.assertEqual(resizes, 13)
+            for i in range(20000):
+                self.assertEqual(table[str(i)], i)
@@ -1,8 +1,13 @@
 import unittest
 from ed_utils.decorators import number
 
-from mountain import Mountain
+import io
+import pickle
+
+from mountain import FrozenMountain, Mountain, MountainInterner
 from mountain_manager import MountainManager
+from serialize import load, serialize
+from trail import Trail, TrailSeries, TrailSplit
 
 class TestInfiniteHash(unittest.TestCase):
 
@@ -56,3 +61,52 @@ class TestInfiniteHash(unittest.TestCase):
         self.assertEqual(len(res), 4)
 
         self.assertEqual(make_set(res[3]), make_set([m10]))
+
+    @number("5.2")
+    def test_interning(self):
+        interner = MountainInterner(FrozenMountain)
+        mm = MountainManager(interner)
+        mm.add_mountain(Mountain("m1", 2, 2))
+        mm.add_mountain(Mountain("m1", 2, 2))
+        mm.add_mountain(Mountain("m1", 2, 3))
+        self.assertIs(mm.mountains[0], mm.mountains[1])
+        self.assertIsNot(mm.mountains[0], mm.mountains[2])
+        self.assertEqual(len(interner), 2)
+
+        trail = Trail(TrailSplit(
+            Trail(TrailSeries(Mountain("m1", 2, 2), Trail(None))),
+            Trail(TrailSeries(Mountain("m1", 2, 2), Trail(None))),
+            Trail(None),
+        ))
+        loaded = load(io.StringIO(serialize(trail)), make_mountain=interner)
+        self.assertIs(loaded.store.path_top.store.mountain, mm.mountains[0])
+        self.assertIs(loaded.store.path_bottom.store.mountain, mm.mountains[0])
+        self.assertEqual(len(interner), 2)
+
+    @number("5.3")
+    def test_frozen_mountain(self):
+        frozen = FrozenMountain("m1", 2, 2)
+        self.assertEqual(hash(frozen), hash(FrozenMountain("m1", 2, 2)))
+        self.assertEqual(len({frozen, FrozenMountain("m1", 2, 2), FrozenMountain("m2", 2, 2)}), 2)
+        self.assertRaises(AttributeError, lambda: setattr(frozen, "length", 3))
+        self.assertEqual(pickle.loads(pickle.dumps(frozen)), frozen)
+        self.assertEqual(frozen.thaw(), Mountain("m1", 2, 2))
+        self.assertRaises(AttributeError, lambda: setattr(Mountain("m1", 2, 2), "height", 3))
+
+    @number("5.4")
+    def test_interning_edits(self):
+        mm = MountainManager(MountainInterner())
+        m1, m2 = Mountain("m1", 2, 2), Mountain("m2", 3, 3)
+        mm.add_mountain(m1)
+        mm.add_mountain(Mountain("m1", 2, 2))
+        mm.add_mountain(m2)
+        self.assertIsInstance(mm.mountains[0], FrozenMountain)
+        # The mountains given back are found, though the manager holds shared FrozenMountains.
+        mm.remove_mountain(m1)
+        self.assertEqual(len(mm.mountains), 2)
+        mm.edit_mountain(m2, Mountain("m3", 4, 4))
+        self.assertEqual(mm.mountains_with_difficulty(3), [])
+        self.assertEqual([mountain.name for mountain in mm.mountains_with_difficulty(4)], ["m3"])
+        mm.edit_mountain(Mountain("m1", 2, 2), Mountain("m1", 2, 5))
+        self.assertEqual([(mountain.name, mountain.length) for mountain in mm.mountains], [("m3", 4), ("m1", 5)])
+        self.assertRaises(ValueError, lambda: mm.remove_mountain(m2))
@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit
+from serialize import serialize, deserialize, dump, load, dump_file, load_file, open_store
+from tests.fixtures import generate_trail
+from draw_trails import TrailBox, TrailSeriesBox
+
+class TestSerialize(unittest.TestCase):
+
+    def load_example(self):
+        self.trail = Trail(TrailSeries(Mountain("a", 1, 2), Trail(TrailSplit(
+            Trail(TrailSeries(Mountain('b "quoted"', 3, 4), Trail(None))),
+            Trail(None),
+            Trail(TrailSeries(Mountain("cé", 5, 6), Trail(None))),
+        ))))
+
+    @number("11.1")
+    def test_load(self):
+        self.load_example()
+        text = serialize(self.trail)
+        self.assertEqual(deserialize(json.loads(text)), self.trail)
+        # Small chunks split tokens across reads.
+        for chunk_size in [1, 2, 5, 1 << 16]:
+            self.assertEqual(load(io.StringIO(text), chunk_size), self.trail)
+        self.assertEqual(load(io.StringIO(json.dumps(json.loads(text), indent=4))), self.trail)
+        self.assertEqual(load(io.StringIO('{"store": null}')), Trail(None))
+
+    @number("11.2")
+    def test_load_errors(self):
+        for text in ['{"store": null', '{"store": null}}', '', '[1, 2]', '{"store": nul}']:
+            self.assertRaises(ValueError, lambda: load(io.StringIO(text)))
+        # Well formed JSON that isn't a trail.
+        mountain = '{"name": "a", "difficulty_level": 1, "length": 2}'
+        for text in [
+            '{"store": {"foo": 1}}',
+            '{"store": {"mountain": 5, "following": {"store": null}}}',
+            '{"store": {"mountain": ' + mountain + '}}',
+            '{"store": {"mountain": ' + mountain + ', "following": {"store": null}, "extra": 1}}',
+            '{"store": {"path_top": {"store": null}, "path_follow": {"store": null}}}',
+            '{"store": {"path_top": {"store": null}, "path_bottom": 1, "path_follow": {"store": null}}}',
+            '{"store": {"mountain": {"name": "a", "length": 2}, "following": {"store": null}}}',
+            '{"store": {"mountain": {"name": 1, "difficulty_level": 1, "length": 2}, "following": {"store": null}}}',
+            '{"store": ' + mountain + '}',
+            '{"store": {"store": null}}',
+        ]:
+            self.assertRaises(ValueError, lambda: load(io.StringIO(text)))
+        # Missing or extra separators.
+        for text in ['{"store" null}', '{"store": null,,,}', '{"store": null,}', '{,"store": null}',
+                     '{"store": null "x": 1}', '{"store": null, "x": [1 2]}', '{"store": null, "x": [1,]}',
+                     '{"store": null, "x": 1:}', '{"store"}']:
+            self.assertRaises(ValueError, lambda: load(io.StringIO(text)))
+        # Mountain shaped objects outside a series are left alone.
+        extra = {}
+        load(io.StringIO('{"store": null, "x": ' + mountain + '}'), extra=extra)
+        self.assertEqual(extra, {"x": {"name": "a", "difficulty_level": 1, "length": 2}})
+
+    @number("11.3")
+    def test_load_deep(self):
+        text = '{"store": null}'
+        for i in range(3000):
+            text = f'{{"store": {{"mountain": {{"name": "m{i}", "difficulty_level": 1, "length": 1}}, "following": {text}}}}}'
+        trail = load(io.StringIO(text), 100)
+        self.assertEqual(len(trail.collect_all_mountains()), 3000)
+        self.assertEqual(trail.store.mountain, Mountain("m2999", 1, 1))
+
+    @number("11.4")
+    def test_load_errors_early(self):
+        class CountingReader(io.StringIO):
+            read_size = 0
+
+            def read(self, size=-1):
+                data = super().read(size)
+                self.read_size += len(data)
+                return data
+
+        text = serialize(generate_trail(2000))
+        for bad in ["@" + text, text[:100] + "@" + text[100:], '{"store": nulx' + text]:
+            reader = CountingReader(bad)
+            self.assertRaises(ValueError, lambda: load(reader, 64))
+            # Raised on the chunk holding the bad data, not after reading the rest.
+            self.assertLessEqual(reader.read_size, 256)
+        # Tokens that could still continue in the next chunk are waited for.
+        extra = {}
+        for chunk_size in [1, 2, 3]:
+            load(io.StringIO('{"store": null, "x": 12.5e-3, "y": [-4, true, "a\\"b"]}'), chunk_size, extra=extra)
+            self.assertEqual(extra, {"x": 0.0125, "y": [-4, True, 'a"b']})
+
+    @number("11.5")
+    def test_load_memory(self):
+        text = serialize(generate_trail(5000))
+
+        def peak_over_result(load_text):
+            tracemalloc.start()
+            trail = load_text()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.assertEqual(len(trail.collect_all_mountains()), 5000)
+            return peak - current
+
+        # Streaming only holds a chunk and the open objects on top of the trail,
+        # where json holds every parsed dict (the text itself is already in memory here).
+        reader = io.StringIO(text)
+        streamed = peak_over_result(lambda: load(reader))
+        parsed = peak_over_result(lambda: deserialize(json.loads(text)))
+        self.assertLess(streamed * 4, parsed)
+
+    @number("13.1")
+    def test_dump(self):
+        self.load_example()
+        for trail in [self.trail, Trail(None)]:
+            buffer = io.StringIO()
+            dump(trail, buffer, flush_every=2)
+            self.assertEqual(buffer.getvalue(), serialize(trail))
+
+        # Drawing boxes are never written.
+        boxed = TrailBox(TrailSeriesBox(Mountain("a", 1, 2), TrailBox(None)))
+        buffer = io.StringIO()
+        dump(boxed, buffer)
+        self.assertEqual(buffer.getvalue(), serialize(boxed))
+        self.assertNotIn("_box", buffer.getvalue())
+
+    @number("13.2")
+    def test_dump_deep(self):
+        trail = Trail(None)
+        for i in range(3000):
+            trail = trail.add_mountain_before(Mountain(f"m{i}", i, 1))
+        buffer = io.StringIO()
+        dump(trail, buffer)
+        buffer.seek(0)
+        self.assertEqual(load(buffer).collect_all_mountains(), trail.collect_all_mountains())
+
+    @number("18.1")
+    def test_compressed(self):
+        trail = generate_trail(500)
+        with tempfile.TemporaryDirectory() as directory:
+            sizes = {}
+            for name in ["trail.json", "trail.json.gz", "trail.json.xz"]:
+                path = os.path.join(directory, name)
+                dump_file(trail, path)
+                self.assertEqual(load_file(path), trail)
+                sizes[name] = os.path.getsize(path)
+            self.assertLess(sizes["trail.json.gz"] * 5, sizes["trail.json"])
+            self.assertLess(sizes["trail.json.xz"] * 5, sizes["trail.json"])
+            # Compressed files really are gzip and lzma.
+            with open(os.path.join(directory, "trail.json.gz"), "rb") as f:
+                self.assertEqual(f.read(2), b"\x1f\x8b")
+            with open_store(os.path.join(directory, "trail.json.xz")) as f:
+                self.assertEqual(f.read(), serialize(trail))
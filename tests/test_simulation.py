@@ -0,0 +1,58 @@
+import pickle
+import random
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit
+from personality import WalkerPersonality, TopWalker
+from compiled_trail import CompiledTrail
+from simulation import simulate_walkers
+
+class RandomWalker(WalkerPersonality):
+    def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
+        return random.random() < 0.5
+
+class TestSimulation(unittest.TestCase):
+
+    def load_example(self):
+        self.top_top = Mountain("top-top", 5, 3)
+        self.top_bot = Mountain("top-bot", 3, 5)
+        self.top_mid = Mountain("top-mid", 4, 7)
+        self.bot_one = Mountain("bot-one", 2, 5)
+        self.bot_two = Mountain("bot-two", 0, 0)
+        self.final   = Mountain("final", 4, 4)
+        self.trail = Trail(TrailSplit(
+            Trail(TrailSplit(
+                Trail(TrailSeries(self.top_top, Trail(None))),
+                Trail(TrailSeries(self.top_bot, Trail(None))),
+                Trail(TrailSeries(self.top_mid, Trail(None))),
+            )),
+            Trail(TrailSeries(self.bot_one, Trail(TrailSplit(
+                Trail(TrailSeries(self.bot_two, Trail(None))),
+                Trail(None),
+                Trail(None),
+            )))),
+            Trail(TrailSeries(self.final, Trail(None)))
+        ))
+
+    @number("9.1")
+    def test_pickle_compiled(self):
+        self.load_example()
+        compiled = pickle.loads(pickle.dumps(CompiledTrail(self.trail)))
+        self.assertEqual(compiled.trails[0], self.trail)
+        walker = TopWalker()
+        compiled.follow_path(walker)
+        self.assertListEqual(walker.mountains, [self.top_top, self.top_mid, self.final])
+
+    @number("9.2")
+    def test_simulate(self):
+        self.load_example()
+        visits = simulate_walkers(self.trail, TopWalker, 10, workers=2)
+        self.assertDictEqual(visits, {"top-top": 10, "top-mid": 10, "final": 10})
+
+        visits = simulate_walkers(self.trail, RandomWalker, 200, workers=3, seed=1)
+        self.assertEqual(visits["final"], 200)
+        self.assertEqual(visits["top-top"] + visits["top-bot"], visits["top-mid"])
+        self.assertEqual(visits["top-mid"] + visits["bot-one"], 200)
+        self.assertEqual(visits, simulate_walkers(self.trail, RandomWalker, 200, workers=3, seed=1))
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from mountain import FrozenMountain, Mountain
+from trail import Trail, TrailSeries, TrailSplit
+from versioned_trail import VersionedTrail
+from binary_store import BinaryTrailStore, dump_binary, load_binary
+from tests.fixtures import generate_trail
+from trail_diff import deduplicate, diff
+
+class TestTrailDiff(unittest.TestCase):
+
+    def make_branch(self):
+        return Trail(TrailSeries(Mountain("b", 3, 4), Trail(TrailSeries(Mountain("c", 5, 6), Trail(None)))))
+
+    @number("19.1")
+    def test_hash_equality(self):
+        trail = generate_trail(300)
+        copy = generate_trail(300)
+        self.assertIsNot(trail, copy)
+        self.assertEqual(trail.structural_hash(), copy.structural_hash())
+        self.assertEqual(trail, copy)
+        # The same fields make the same hash, whatever kind of mountain holds them.
+        self.assertEqual(Trail(TrailSeries(Mountain("a", 1, 2), Trail(None))), Trail(TrailSeries(FrozenMountain("a", 1, 2), Trail(None))))
+
+        copy.store.path_top.add_mountain_before(Mountain("new", 1, 1))
+        self.assertEqual(trail, copy)
+        copy.store.path_top = copy.store.path_top.add_mountain_before(Mountain("new", 1, 1))
+        self.assertNotEqual(trail, copy)
+        self.assertNotEqual(trail.structural_hash(), copy.structural_hash())
+        self.assertEqual(trail.store.path_bottom, copy.store.path_bottom)
+
+        # Equality always sees the trails as they are, however they were changed.
+        a = Trail(TrailSeries(Mountain("a", 1, 1), Trail(None)))
+        b = Trail(TrailSeries(Mountain("a", 1, 1), Trail(None)))
+        self.assertEqual(a, b)
+        b.store = TrailSeries(Mountain("z", 9, 9), Trail(None))
+        self.assertNotEqual(a, b)
+        c = Trail(TrailSeries(Mountain("a", 1, 1), Trail(None)))
+        self.assertEqual(a.structural_hash(), c.structural_hash())
+        c.store.mountain.name = "q"
+        self.assertNotEqual(a, c)
+
+        # Deep trails compare without recursion.
+        deep = Trail(None)
+        for i in range(5000):
+            deep = Trail(TrailSeries(Mountain(str(i), 1, 1), deep))
+        other = Trail(None)
+        for i in range(5000):
+            other = Trail(TrailSeries(Mountain(str(i), 1, 1), other))
+        self.assertEqual(deep, other)
+
+    @number("19.2")
+    def test_diff(self):
+        versions = VersionedTrail(Trail(TrailSeries(Mountain("a", 1, 2), Trail(TrailSplit(
+            self.make_branch(),
+            Trail(None),
+            self.make_branch(),
+        )))))
+        first = versions.trail
+        self.assertListEqual(diff(first, first), [])
+
+        d = Mountain("d", 1, 1)
+        versions.edit(["following", "path_bottom"], "add_empty_branch_before")
+        versions.replace_mountain(["following", "path_follow"], d)
+        changes = diff(first, versions.trail)
+        self.assertListEqual([path for path, _, _ in changes], [
+            ("following", "path_bottom"),
+            ("following", "path_follow"),
+        ])
+        path, before, after = changes[1]
+        self.assertIs(after.store.mountain, d)
+        self.assertIs(before.store.following, after.store.following)
+        # Trails of different kinds are one difference, which isn't looked into.
+        self.assertEqual(len(diff(first, Trail(None))), 1)
+
+    @number("19.3")
+    def test_deduplicate(self):
+        trail = Trail(TrailSplit(self.make_branch(), self.make_branch(), Trail(TrailSplit(self.make_branch(), Trail(None), Trail(None)))))
+        shared = deduplicate(trail)
+        self.assertEqual(shared, trail)
+        self.assertIs(shared.store.path_top, shared.store.path_bottom)
+        self.assertIs(shared.store.path_top, shared.store.path_follow.store.path_top)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trail.trlb")
+            sizes = []
+            for dedup in [False, True]:
+                with open(path, "wb") as f:
+                    dump_binary(trail, f, dedup)
+                with BinaryTrailStore(path) as store:
+                    sizes.append(len(store))
+                self.assertEqual(load_binary(path), trail)
+            self.assertListEqual(sizes, [13, 5])
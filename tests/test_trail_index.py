@@ -0,0 +1,119 @@
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit, trail_edited
+from trail_index import TrailIndex
+
+class TestTrailIndex(unittest.TestCase):
+
+    def load_example(self):
+        self.a, self.b, self.c, self.d = (Mountain(letter, 5, 5) for letter in "abcd")
+        self.trail = Trail(TrailSeries(self.a, Trail(TrailSplit(
+            Trail(TrailSeries(self.b, Trail(TrailSeries(self.d, Trail(None))))),
+            Trail(None),
+            Trail(TrailSeries(self.c, Trail(None))),
+        ))))
+        self.index = TrailIndex(self.trail)
+
+    def names(self):
+        return [mountain.name for mountain in self.trail.collect_all_mountains()]
+
+    @number("8.1")
+    def test_lookup(self):
+        self.load_example()
+        self.assertEqual(len(self.index), 4)
+        self.assertIn("d", self.index)
+        self.assertNotIn("e", self.index)
+        self.assertIs(self.index["b"], self.b)
+        self.assertIs(self.index.locate("a"), self.trail)
+        self.assertIs(self.index.locate("c"), self.trail.store.following.store.path_follow)
+        self.assertRaises(KeyError, lambda: self.index.locate("e"))
+
+    @number("8.2")
+    def test_edits(self):
+        self.load_example()
+        e, f, g = (Mountain(letter, 1, 1) for letter in "efg")
+
+        self.index.add_mountain_before("b", e)
+        self.index.add_mountain_after("d", f)
+        self.index.add_empty_branch_before("c")
+        self.index.add_empty_branch_after("a")
+        self.assertListEqual(self.names(), ["a", "e", "b", "d", "f", "c"])
+
+        self.assertIs(self.index.remove("b"), self.b)
+        self.index.remove("a")
+        self.index.replace("f", g)
+        self.assertListEqual(self.names(), ["e", "d", "g", "c"])
+
+        # Every remaining mountain can still be found where it is.
+        for name in "edgc":
+            self.assertEqual(self.index.locate(name).store.mountain.name, name)
+        self.assertNotIn("a", self.index)
+        self.assertNotIn("f", self.index)
+
+    @number("8.3")
+    def test_outside_edit(self):
+        self.load_example()
+        e = Mountain("e", 1, 1)
+        self.trail.store = self.trail.store.add_mountain_after(e)
+        self.assertIs(self.index.locate("e"), self.trail.store.following)
+        self.index.remove("e")
+        self.assertListEqual(self.names(), ["a", "b", "d", "c"])
+
+    @number("8.4")
+    def test_outside_edits_are_followed(self):
+        self.load_example()
+        e, f = Mountain("e", 1, 1), Mountain("f", 1, 1)
+        split = self.trail.store.following.store
+        # A store's subtrail replaced, as when editing an empty trail.
+        split.path_bottom = split.path_bottom.add_mountain_before(e)
+        self.assertIs(self.index.locate("e"), split.path_bottom)
+        # A series moved between trails.
+        top = split.path_top
+        top.store = top.store.remove_mountain()
+        self.assertNotIn("b", self.index)
+        self.assertIs(self.index.locate("d"), top)
+        # A branch removed, with everything on it.
+        self.trail.store.following.store = split.remove_branch()
+        self.assertNotIn("d", self.index)
+        self.assertNotIn("e", self.index)
+        self.assertIs(self.index.locate("c"), self.trail.store.following)
+        # A mountain swapped, or renamed in place.
+        self.trail.store.mountain = f
+        self.assertIs(self.index.locate("f"), self.trail)
+        f.name = "g"
+        trail_edited(self.trail)
+        self.assertNotIn("f", self.index)
+        self.assertIs(self.index["g"], f)
+        self.assertListEqual(self.names(), ["g", "c"])
+        self.assertEqual(len(self.index), 2)
+
+    @number("8.5")
+    def test_duplicate_names(self):
+        self.load_example()
+        self.index.replace("d", Mountain("b", 1, 1))
+        self.assertEqual(len(self.index), 4)
+        first = self.index.remove("b")
+        self.assertIn("b", self.index)
+        second = self.index.remove("b")
+        self.assertNotIn("b", self.index)
+        self.assertCountEqual([first.difficulty_level, second.difficulty_level], [5, 1])
+        self.assertListEqual(self.names(), ["a", "c"])
+
+    @number("8.6")
+    def test_indexes_are_independent(self):
+        trails = [Trail(None), Trail(None)]
+        for i in range(2000):
+            for j, trail in enumerate(trails):
+                trails[j] = trail.add_mountain_before(Mountain(f"{j}-{i}", 1, 1))
+        indexes = [TrailIndex(trail) for trail in trails]
+        # Edits to one trail don't touch the other's index.
+        trails[0].store = trails[0].store.add_mountain_after(Mountain("new", 1, 1))
+        self.assertEqual(indexes[1].locate("1-5").store.mountain.name, "1-5")
+        self.assertNotIn("new", indexes[1])
+        self.assertIs(indexes[0].locate("new"), trails[0].store.following)
+        for i in range(20):
+            for j, index in enumerate(indexes):
+                index.add_mountain_after(f"{j}-{i}", Mountain(f"{j}-added-{i}", 1, 1))
+        self.assertEqual([len(index) for index in indexes], [2021, 2020])
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from serialize import dump, load
+from trail import Trail, TrailSeries, TrailSplit
+from trail_journal import TrailJournal, apply_edit
+
+class TestTrailJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "store.json")
+        self.trail = Trail(TrailSeries(Mountain("a", 1, 2), Trail(TrailSplit(
+            Trail(TrailSeries(Mountain("b", 3, 4), Trail(None))),
+            Trail(None),
+            Trail(TrailSeries(Mountain("c", 5, 6), Trail(None))),
+        ))))
+        with open(self.path, "w") as f:
+            dump(self.trail, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def edit(self, journal, trail, path, op, mountain=None):
+        trail = apply_edit(trail, path, op, mountain)
+        journal.record(path, op, () if mountain is None else (mountain,))
+        return trail
+
+    def reload(self):
+        journal = TrailJournal(self.path)
+        trail = journal.load()
+        journal.close()
+        return trail
+
+    @number("14.1")
+    def test_replay(self):
+        journal = TrailJournal(self.path)
+        trail = journal.load()
+        self.assertEqual(trail, self.trail)
+        trail = self.edit(journal, trail, ["following", "path_top"], "add_mountain_after", Mountain("d", 7, 8))
+        trail = self.edit(journal, trail, ["following", "path_bottom"], "add_mountain_before", Mountain("e", 9, 10))
+        trail = self.edit(journal, trail, ["following", "path_follow"], "remove_mountain")
+        trail = self.edit(journal, trail, [], "edit", Mountain("f", 0, 0))
+        trail = self.edit(journal, trail, ["following"], "add_empty_branch_before")
+        journal.save()
+        # Only the journal was written to.
+        with open(self.path) as f:
+            self.assertEqual(load(f), self.trail)
+        self.assertListEqual([m.name for m in trail.collect_all_mountains()], ["f", "b", "d", "e"])
+        self.assertEqual(self.reload(), trail)
+        journal.close()
+
+    @number("14.2")
+    def test_compact(self):
+        journal = TrailJournal(self.path)
+        trail = journal.load()
+        trail = self.edit(journal, trail, ["following", "path_top"], "remove_mountain")
+        journal.compact().join()
+        self.assertEqual(journal.pending, 0)
+        self.assertEqual(os.path.getsize(journal.journal_path), 0)
+        with open(self.path) as f:
+            self.assertEqual(load(f), trail)
+        # Edits after compaction go on top of the new snapshot.
+        trail = self.edit(journal, trail, ["following"], "remove_branch")
+        journal.close()
+        self.assertEqual(self.reload(), trail)
+
+    @number("14.3")
+    def test_torn_record(self):
+        journal = TrailJournal(self.path)
+        trail = journal.load()
+        trail = self.edit(journal, trail, [], "add_mountain_before", Mountain("d", 7, 8))
+        journal.close()
+        with open(journal.journal_path, "a") as f:
+            f.write('{"seq": 2, "path": [], "op": "remove_mou')
+        self.assertEqual(self.reload(), trail)
+        # The torn record is dropped, so new records are still readable.
+        journal = TrailJournal(self.path)
+        trail = journal.load()
+        trail = self.edit(journal, trail, [], "remove_mountain")
+        journal.close()
+        self.assertEqual(self.reload(), self.trail)
+
+    @number("14.4")
+    def test_close_compacts(self):
+        journal = TrailJournal(self.path, compact_after=2)
+        trail = journal.load()
+        trail = self.edit(journal, trail, [], "add_mountain_before", Mountain("d", 7, 8))
+        trail = self.edit(journal, trail, ["following"], "remove_mountain")
+        trail = self.edit(journal, trail, [], "edit", Mountain("e", 9, 10))
+        # The journal is long enough to compact, which close finishes before closing the file.
+        journal.close()
+        self.assertIsNone(journal.file)
+        self.assertTrue(journal.compaction is None or not journal.compaction.is_alive())
+        self.assertEqual(os.path.getsize(journal.journal_path), 0)
+        with open(self.path) as f:
+            self.assertEqual(load(f), trail)
+        self.assertEqual(self.reload(), trail)
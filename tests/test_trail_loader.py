@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from serialize import dump, dump_file, load
+from trail import Trail, TrailSeries
+from binary_store import convert_json_to_binary
+from trail_loader import TrailLoader
+from tests.fixtures import generate_trail
+
+class TestTrailLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "basic.json")
+        shutil.copy("stores/basic.json", self.path)
+        with open(self.path) as f:
+            self.expected = load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def rewrite(self, trail):
+        stat = os.stat(self.path)
+        with open(self.path, "w") as f:
+            dump(trail, f)
+        # Make sure the change shows up even on file systems with coarse modification times.
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    @number("16.1")
+    def test_cache(self):
+        for hash_contents in [False, True]:
+            loader = TrailLoader(hash_contents=hash_contents)
+            trail = loader.load(self.path)
+            self.assertEqual(trail, self.expected)
+            self.assertIs(loader.load(self.path), trail)
+            self.assertEqual((loader.hits, loader.misses), (1, 1))
+
+            changed = Trail(TrailSeries(Mountain("new", 1, 1), Trail(None)))
+            self.rewrite(changed)
+            self.assertEqual(loader.load(self.path), changed)
+            self.assertEqual(len(loader), 1)
+            self.rewrite(self.expected)
+
+    @number("16.2")
+    def test_eviction(self):
+        size = os.path.getsize(self.path)
+        paths = [self.path]
+        for i in range(3):
+            paths.append(os.path.join(self.dir, f"copy{i}.json"))
+            shutil.copy(self.path, paths[-1])
+        loader = TrailLoader(max_bytes=2 * size)
+        for path in paths:
+            loader.load(path)
+        self.assertEqual(len(loader), 2)
+        self.assertLessEqual(loader.cached_bytes, 2 * size)
+        # The least recently used are gone.
+        loader.load(paths[3])
+        loader.load(paths[0])
+        self.assertEqual((loader.hits, loader.misses), (1, 5))
+
+    @number("16.3")
+    def test_load_all(self):
+        convert_json_to_binary(self.path, os.path.join(self.dir, "basic.trlb"))
+        with open(os.path.join(self.dir, "notes.txt"), "w") as f:
+            f.write("not a store")
+        loader = TrailLoader()
+        trails = loader.load_all(self.dir, workers=2)
+        self.assertListEqual(sorted(trails), ["basic.json", "basic.trlb"])
+        for trail in trails.values():
+            self.assertEqual(trail, self.expected)
+        self.assertIs(loader.load(self.path), trails["basic.json"])
+
+    @number("18.2")
+    def test_compressed_size(self):
+        trail = generate_trail(2000)
+        for name in ["big.json", "big.json.gz", "big.json.xz"]:
+            dump_file(trail, os.path.join(self.dir, name))
+        json_size = os.path.getsize(os.path.join(self.dir, "big.json"))
+        for hash_contents in [False, True]:
+            loader = TrailLoader(hash_contents=hash_contents)
+            for name in ["big.json.gz", "big.json.xz"]:
+                path = os.path.join(self.dir, name)
+                self.assertLess(os.path.getsize(path), json_size // 3)
+                loader.clear()
+                loader.load(path)
+                # Charged for the JSON it parsed, not the compressed file.
+                self.assertEqual(loader.cached_bytes, json_size)
+            # A budget that fits the compressed files, but not the trails, keeps nothing.
+            small = TrailLoader(max_bytes=json_size // 2, hash_contents=hash_contents)
+            small.load(os.path.join(self.dir, "big.json.gz"))
+            self.assertEqual(len(small), 0)
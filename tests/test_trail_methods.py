@@ -2,7 +2,8 @@ import unittest
 from ed_utils.decorators import number
 
 from mountain import Mountain
-from trail import Trail, TrailSeries, TrailSplit, TrailStore
+from trail import Trail, TrailSeries, TrailSplit, TrailStore, TrailStats, trail_edited
+from serialize import deserialize
 
 class TestTrailMethods(unittest.TestCase):
 
@@ -57,3 +58,115 @@ class TestTrailMethods(unittest.TestCase):
             self.top_bot, self.top_top, self.top_mid,
             self.bot_one, self.bot_two, self.final
         ])))
+
+    @number("7.2")
+    def test_count_paths(self):
+        self.load_example()
+
+        self.assertEqual(self.trail.count_k_paths(3), 3)
+        self.assertEqual(self.trail.count_k_paths(2), 1)
+        self.assertEqual(self.trail.count_k_paths(4), 0)
+        self.assertEqual(self.trail.count_k_paths(-1), 0)
+        self.assertDictEqual(self.trail.path_length_distribution(), {2: 1, 3: 3})
+        self.assertEqual(Trail(None).count_k_paths(0), 1)
+
+        # Five optional mountains in a row give binomial path counts.
+        trail = Trail(None)
+        for i in range(5):
+            trail = Trail(TrailSplit(
+                Trail(TrailSeries(Mountain(f"top-{i}", 1, 1), Trail(None))),
+                Trail(None),
+                trail,
+            ))
+        self.assertDictEqual(trail.path_length_distribution(), {0: 1, 1: 5, 2: 10, 3: 10, 4: 5, 5: 1})
+
+    @number("7.3")
+    def test_iter_paths(self):
+        self.load_example()
+
+        paths = self.trail.iter_k_paths(3)
+        self.assertListEqual(next(paths), [self.top_top, self.top_mid, self.final])
+        self.assertListEqual(list(paths), [
+            [self.top_bot, self.top_mid, self.final],
+            [self.bot_one, self.bot_two, self.final],
+        ])
+        self.assertListEqual(list(self.trail.iter_k_paths(2)), [[self.bot_one, self.final]])
+        self.assertListEqual(list(self.trail.iter_k_paths(1)), [])
+        self.assertListEqual(list(Trail(None).iter_k_paths(0)), [[]])
+
+    @number("7.4")
+    def test_deep_trail(self):
+        self.load_example()
+        self.assertListEqual(list(self.trail.iter_mountains()), [
+            self.top_top, self.top_bot, self.top_mid,
+            self.bot_one, self.bot_two, self.final,
+        ])
+
+        # Well past the recursion limit.
+        depth = 5000
+        trail = Trail(None)
+        obj = {"store": None}
+        for i in range(depth):
+            trail = trail.add_mountain_before(Mountain(f"m{i}", 1, 1))
+            obj = {"store": {"mountain": {"name": f"m{i}", "difficulty_level": 1, "length": 1}, "following": obj}}
+
+        self.assertEqual(len(trail.collect_all_mountains()), depth)
+        self.assertEqual(trail.count_k_paths(depth), 1)
+        self.assertEqual(deserialize(obj).collect_all_mountains(), trail.collect_all_mountains())
+
+    @number("7.5")
+    def test_stats(self):
+        self.load_example()
+
+        stats = self.trail.stats()
+        self.assertEqual(stats, TrailStats(
+            mountain_count=6,
+            total_length=24,
+            min_difficulty=0,
+            max_difficulty=5,
+            max_path_length=3,
+        ))
+        self.assertIs(self.trail.stats(), stats)
+        self.assertEqual(self.trail.store.path_bottom.stats().mountain_count, 2)
+        self.assertEqual(Trail(None).stats(), TrailStats(0, 0, None, None, 0))
+
+        # Edits drop the cached totals.
+        heavy = Mountain("heavy", 9, 10)
+        bottom = self.trail.store.path_bottom
+        bottom.store = bottom.store.add_mountain_after(heavy)
+        stats = self.trail.stats()
+        self.assertEqual(stats.mountain_count, 7)
+        self.assertEqual(stats.total_length, 34)
+        self.assertEqual(stats.max_difficulty, 9)
+        self.assertEqual(stats.max_path_length, 4)
+
+        # Only the changed trail and the trails above it are totalled again,
+        # and editing another trail drops nothing.
+        top_stats = self.trail.store.path_top.stats()
+        Trail(None).store = TrailSeries(heavy, Trail(None))
+        self.assertIs(self.trail.stats(), stats)
+        bottom.store.following.store.mountain = Mountain("light", 1, 1)
+        stats = self.trail.stats()
+        self.assertEqual((stats.total_length, stats.max_difficulty), (25, 5))
+        self.assertIs(self.trail.store.path_top.stats(), top_stats)
+        # Mountains changed in place need trail_edited.
+        bottom.store.following.store.mountain.length = 2
+        trail_edited(bottom.store.following)
+        self.assertEqual(self.trail.stats().total_length, 26)
+
+    @number("7.6")
+    def test_best_paths(self):
+        self.load_example()
+
+        self.assertListEqual(self.trail.min_difficulty_path(), [self.bot_one, self.bot_two, self.final])
+        self.assertListEqual(self.trail.longest_path(), [self.top_bot, self.top_mid, self.final])
+
+        shortest = self.trail.k_best_paths(2, lambda mountain: 1)
+        self.assertListEqual(shortest, [
+            [self.bot_one, self.final],
+            [self.top_top, self.top_mid, self.final],
+        ])
+        by_length = self.trail.k_best_paths(10, lambda mountain: mountain.length)
+        self.assertListEqual([sum(m.length for m in path) for path in by_length], [9, 9, 14, 16])
+        self.assertListEqual(self.trail.k_best_paths(0, lambda mountain: 1), [])
+        self.assertListEqual(Trail(None).min_difficulty_path(), [])
@@ -2,8 +2,9 @@ import unittest
 from ed_utils.decorators import number
 
 from mountain import Mountain
-from trail import Trail, TrailSeries, TrailSplit, TrailStore
+from trail import Trail, TrailSeries, TrailSplit, TrailStore, trail_edited
 from personality import WalkerPersonality, TopWalker, BottomWalker, LazyWalker
+from compiled_trail import CompiledTrail
 
 class TestTrailMethods(unittest.TestCase):
 
@@ -59,3 +60,101 @@ class TestTrailMethods(unittest.TestCase):
         self.trail.follow_path(cw)
 
         self.assertListEqual(cw.mountains, [self.bot_one, self.bot_two, self.final])
+
+    @number("2.3")
+    def test_compiled_walk(self):
+        self.load_example()
+        compiled = CompiledTrail(self.trail)
+        self.assertEqual(len(compiled), 16)
+
+        for personality in [TopWalker, BottomWalker, LazyWalker]:
+            expected = personality()
+            actual = personality()
+            self.trail.follow_path(expected)
+            compiled.follow_path(actual)
+            self.assertListEqual(actual.mountains, expected.mountains)
+
+        empty = TopWalker()
+        CompiledTrail(Trail(None)).follow_path(empty)
+        self.assertListEqual(empty.mountains, [])
+
+    @number("2.4")
+    def test_cached_walk(self):
+        class CountingWalker(TopWalker):
+            calls = 0
+            def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
+                CountingWalker.calls += 1
+                return True
+
+        self.load_example()
+        first = CountingWalker()
+        second = CountingWalker()
+        self.trail.follow_path(first)
+        self.trail.follow_path(second)
+        self.assertEqual(CountingWalker.calls, 2)
+        self.assertListEqual(second.mountains, [self.top_top, self.top_mid, self.final])
+
+        # Editing through a store method drops the cached walk.
+        extra = Mountain("extra", 1, 1)
+        self.trail.store.path_follow.store = self.trail.store.path_follow.store.add_mountain_after(extra)
+        third = CountingWalker()
+        self.trail.follow_path(third)
+        self.assertEqual(CountingWalker.calls, 4)
+        self.assertListEqual(third.mountains, [self.top_top, self.top_mid, self.final, extra])
+
+        # So does assigning a store directly, however deep, but edits to other trails don't.
+        Trail(None).store = TrailSeries(extra, Trail(None))
+        self.trail.follow_path(CountingWalker())
+        self.assertEqual(CountingWalker.calls, 4)
+        self.trail.store.path_follow.store.following = Trail(None)
+        fourth = CountingWalker()
+        self.trail.follow_path(fourth)
+        self.assertEqual(CountingWalker.calls, 6)
+        self.assertListEqual(fourth.mountains, [self.top_top, self.top_mid, self.final])
+        self.trail.store.path_follow.store.following.store = TrailSeries(extra, Trail(None))
+        fifth = CountingWalker()
+        self.trail.follow_path(fifth)
+        self.assertListEqual(fifth.mountains, [self.top_top, self.top_mid, self.final, extra])
+
+        # Changing a mountain in place that decides a branch needs trail_edited.
+        lazy = LazyWalker()
+        self.trail.follow_path(lazy)
+        self.assertListEqual(lazy.mountains, [self.top_bot, self.top_mid, self.final, extra])
+        top_top = self.trail.store.path_top.store.path_top
+        top_top.store.mountain.difficulty_level = 1
+        trail_edited(top_top)
+        lazy = LazyWalker()
+        self.trail.follow_path(lazy)
+        self.assertListEqual(lazy.mountains, [self.top_top, self.top_mid, self.final, extra])
+
+    @number("2.5")
+    def test_cached_walk_whole_branches(self):
+        class ShortWalker(WalkerPersonality):
+            DETERMINISTIC = True
+            calls = 0
+            def select_branch(self, top_branch: Trail, bottom_branch: Trail) -> bool:
+                # Looks all the way into both branches.
+                ShortWalker.calls += 1
+                return len(top_branch.collect_all_mountains()) <= len(bottom_branch.collect_all_mountains())
+
+        self.load_example()
+        walker = ShortWalker()
+        self.trail.follow_path(walker)
+        self.trail.follow_path(ShortWalker())
+        self.assertEqual(ShortWalker.calls, 2)
+        self.assertListEqual(walker.mountains, [self.bot_one, self.final])
+
+        # Shortening the top branch deep inside, where the walk never went, drops the cached walk.
+        self.trail.store.path_top.store.path_follow.store = None
+        walker = ShortWalker()
+        self.trail.follow_path(walker)
+        self.assertListEqual(walker.mountains, [self.top_top, self.final])
+        fresh = ShortWalker()
+        self.trail._walk(fresh)
+        self.assertListEqual(walker.mountains, fresh.mountains)
+
+        # As does shortening the bottom branch, now that the walk no longer takes it.
+        self.trail.store.path_bottom.store.following.store.path_top.store = None
+        walker = ShortWalker()
+        self.trail.follow_path(walker)
+        self.assertListEqual(walker.mountains, [self.bot_one, self.final])
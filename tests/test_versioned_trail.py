@@ -0,0 +1,62 @@
+import unittest
+from ed_utils.decorators import number
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailSplit
+from versioned_trail import VersionedTrail
+
+class TestVersionedTrail(unittest.TestCase):
+
+    def load_example(self):
+        self.a, self.b, self.c = (Mountain(letter, 5, 5) for letter in "abc")
+        self.trail = Trail(TrailSeries(self.a, Trail(TrailSplit(
+            Trail(TrailSeries(self.b, Trail(None))),
+            Trail(None),
+            Trail(TrailSeries(self.c, Trail(None))),
+        ))))
+        self.versions = VersionedTrail(self.trail)
+
+    def names(self, trail):
+        return [mountain.name for mountain in trail.collect_all_mountains()]
+
+    @number("10.1")
+    def test_edit_shares_structure(self):
+        self.load_example()
+        d = Mountain("d", 1, 1)
+        new = self.versions.edit(["following", "path_top"], "add_mountain_after", d)
+
+        self.assertIs(self.versions.trail, new)
+        self.assertListEqual(self.names(new), ["a", "b", "d", "c"])
+        # The old version is untouched, and untouched subtrails are shared.
+        self.assertListEqual(self.names(self.trail), ["a", "b", "c"])
+        self.assertIs(new.store.following.store.path_follow, self.trail.store.following.store.path_follow)
+        self.assertIs(new.store.following.store.path_bottom, self.trail.store.following.store.path_bottom)
+
+        self.versions.edit(["following", "path_bottom"], "add_mountain_before", Mountain("e", 1, 1))
+        self.versions.replace_mountain([], Mountain("z", 1, 1))
+        self.assertListEqual(self.names(self.versions.trail), ["z", "b", "d", "e", "c"])
+
+        self.assertRaises(KeyError, lambda: self.versions.subtrail(["path_top"]))
+        self.assertRaises(TypeError, lambda: self.versions.replace_mountain(["following"], d))
+
+    @number("10.2")
+    def test_undo_redo(self):
+        self.load_example()
+        self.assertFalse(self.versions.can_undo())
+        self.versions.edit([], "remove_mountain")
+        self.versions.edit(["path_follow"], "add_empty_branch_after")
+        second = self.versions.trail
+
+        self.assertIs(self.versions.undo(), self.versions.trail)
+        self.assertListEqual(self.names(self.versions.trail), ["b", "c"])
+        self.assertIs(self.versions.undo(), self.trail)
+        self.assertFalse(self.versions.can_undo())
+        self.versions.redo()
+        self.assertIs(self.versions.redo(), second)
+        self.assertFalse(self.versions.can_redo())
+
+        # A new edit after undoing drops the redo history.
+        self.versions.undo()
+        self.versions.edit([], "add_mountain_before", Mountain("d", 1, 1))
+        self.assertFalse(self.versions.can_redo())
+        self.assertListEqual(self.names(self.versions.trail), ["d", "b", "c"])
@@ -1,14 +1,114 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from hashlib import blake2b
+from itertools import islice
+import heapq
+import weakref
 from data_structures.linked_stack import LinkedStack
 from mountain import Mountain
 
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Callable, Hashable, Iterator, TypeVar, Union
 
 # Avoid circular imports for typing.
 if TYPE_CHECKING:
     from personality import WalkerPersonality
 
+T = TypeVar('T')
+
+def trail_edited(node: Trail | TrailStore) -> None:
+    """
+    Drops results cached from a trail or store, and from every trail they were used for,
+    and tells any TrailIndex watching it.
+
+    Assigning a trail's store, or a store's mountain or subtrails, does this by itself.
+    Call it after changing a mountain in place, with the trail or series holding it.
+    """
+    _invalidate(node)
+    watcher = node.__dict__.get("_watcher")
+    if watcher is not None:
+        watcher.changed(node, None, None)
+
+
+def _depend(node, trail: Trail) -> None:
+    """
+    Records that a result cached on `trail` was worked out from `node`, a trail or store,
+    so that changing `node` drops it.
+    """
+    dependents = node.__dict__.get("_dependents")
+    if dependents is None:
+        node.__dict__["_dependents"] = [weakref.ref(trail)]
+    elif not any(ref() is trail for ref in dependents):
+        dependents.append(weakref.ref(trail))
+
+
+def _invalidate(node) -> None:
+    """
+    Drops the results cached on a trail or store, and on everything recorded as depending on it.
+
+    Dependencies are forgotten as they are dropped, and recorded again when results are next cached,
+    so this only walks up to trails with something cached.
+    :complexity: O(D) where D is the number of dependents dropped.
+    """
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        current.__dict__.pop("_cached", None)
+        dependents = current.__dict__.pop("_dependents", None)
+        if dependents:
+            stack.extend(trail for trail in (ref() for ref in dependents) if trail is not None)
+
+
+# Attributes of trails and stores that results are cached from.
+_TRAIL_FIELDS = frozenset({"store"})
+_STORE_FIELDS = frozenset({"mountain", "following", "path_top", "path_bottom", "path_follow"})
+# Entries of `__dict__` that are never pickled or copied.
+_PRIVATE = ("_cached", "_dependents", "_watcher")
+
+
+def _set_field(node, name: str, value, fields: frozenset) -> None:
+    """
+    Sets an attribute of a trail or store. If it is one of `fields`, drops what was cached from it,
+    and tells its watcher (a TrailIndex, which has a `changed(node, name, old_value)` method).
+    """
+    if name not in fields:
+        object.__setattr__(node, name, value)
+        return
+    watcher = node.__dict__.get("_watcher")
+    old = getattr(node, name, None) if watcher is not None else None
+    object.__setattr__(node, name, value)
+    if "_dependents" in node.__dict__ or "_cached" in node.__dict__:
+        _invalidate(node)
+    if watcher is not None:
+        watcher.changed(node, name, old)
+
+
+def _children(store: TrailStore) -> tuple[Trail, ...]:
+    """Returns the subtrails directly under a store."""
+    if isinstance(store, TrailSeries):
+        return (store.following,)
+    if isinstance(store, TrailSplit):
+        return (store.path_top, store.path_bottom, store.path_follow)
+    return ()
+
+
+def _getstate(node) -> dict:
+    """Returns the `__dict__` of a trail or store to pickle or copy, without its cached results or watcher."""
+    return {name: value for name, value in node.__dict__.items() if name not in _PRIVATE}
+
+
+def series_hash(mountain: Mountain, following: bytes) -> bytes:
+    """Structural hash of a series, from its mountain and the hash of its following trail."""
+    fields = repr((mountain.name, mountain.difficulty_level, mountain.length)).encode()
+    return blake2b(b"S" + fields + following, digest_size=16).digest()
+
+
+def split_hash(top: bytes, bottom: bytes, follow: bytes) -> bytes:
+    """Structural hash of a split, from the hashes of its branches."""
+    return blake2b(b"P" + top + bottom + follow, digest_size=16).digest()
+
+
+EMPTY_HASH = blake2b(b"E", digest_size=16).digest()
+
 
 @dataclass
 class TrailSplit:
@@ -24,6 +124,18 @@ class TrailSplit:
     path_bottom: Trail
     path_follow: Trail
 
+    def __init__(self, path_top: Trail, path_bottom: Trail, path_follow: Trail) -> None:
+        # A new split has nothing cached or watching it, so skip __setattr__.
+        fields = self.__dict__
+        fields["path_top"] = path_top
+        fields["path_bottom"] = path_bottom
+        fields["path_follow"] = path_follow
+
+    def __setattr__(self, name: str, value) -> None:
+        _set_field(self, name, value, _STORE_FIELDS)
+
+    __getstate__ = _getstate
+
     def remove_branch(self) -> TrailStore:
         """Removes the branch, should just leave the remaining following trail."""
         if isinstance(self.path_follow.store, TrailSeries):
@@ -44,6 +156,17 @@ class TrailSeries:
     mountain: Mountain
     following: Trail
 
+    def __init__(self, mountain: Mountain, following: Trail) -> None:
+        # A new series has nothing cached or watching it, so skip __setattr__.
+        fields = self.__dict__
+        fields["mountain"] = mountain
+        fields["following"] = following
+
+    def __setattr__(self, name: str, value) -> None:
+        _set_field(self, name, value, _STORE_FIELDS)
+
+    __getstate__ = _getstate
+
     def remove_mountain(self) -> TrailStore:
         """Removes the mountain at the beginning of this series."""
         return self.following.store
@@ -75,10 +198,33 @@ class TrailSeries:
 TrailStore = Union[TrailSplit, TrailSeries, None]
 
 
+@dataclass(frozen=True)
+class TrailStats:
+    """
+    Totals over every mountain on a trail.
+    The difficulties are None for a trail without mountains.
+    """
+
+    mountain_count: int
+    total_length: int
+    min_difficulty: int | None
+    max_difficulty: int | None
+    max_path_length: int  # Most mountains on any one path through the trail.
+
+
 @dataclass
 class Trail:
     store: TrailStore = None
 
+    def __init__(self, store: TrailStore = None) -> None:
+        # A new trail has nothing cached or watching it, so skip __setattr__.
+        self.__dict__["store"] = store
+
+    def __setattr__(self, name: str, value) -> None:
+        _set_field(self, name, value, _TRAIL_FIELDS)
+
+    __getstate__ = _getstate
+
     def add_mountain_before(self, mountain: Mountain) -> Trail:
         """Adds a mountain before everything currently in the trail."""
         return Trail(TrailSeries(mountain=mountain, following=self))
@@ -88,10 +234,52 @@ class Trail:
         return Trail(TrailSplit(path_top=Trail(None), path_bottom=Trail(None), path_follow=self))
 
     def follow_path(self, personality):
+        if getattr(personality, "DETERMINISTIC", False):
+            # The walk only depends on the trail, so replay it until something it depended on changes.
+            cache = self._cache()
+            key = ("follow_path", type(personality))
+            if key not in cache:
+                shallow = getattr(personality, "SHALLOW", False)
+                if not shallow:
+                    self._watch_all()
+                start = len(personality.mountains)
+                self._walk(personality, self if shallow else None)
+                cache[key] = tuple(personality.mountains[start:])
+            else:
+                personality.add_mountains(cache[key])
+        else:
+            self._walk(personality)
+
+    def _watch_all(self) -> None:
+        """
+        Makes changing anything in this trail drop what is cached on it.
+        Unless it is SHALLOW, the personality may look anywhere in the branches it is given,
+        and every subtrail is either walked or in one of them, so the walk depends on the whole trail.
+
+        :complexity: O(N) where N is the number of trail nodes not already watched, see `fold`.
+        """
+        self.fold(None, lambda store, following: None, lambda store, top, bottom, follow: None, "watch_all")
+
+    def _walk(self, personality, cached_on: Trail | None = None):
+        """
+        Walks the trail, choosing branches with the personality.
+        If the walk of a SHALLOW personality is cached on `cached_on`, every trail and store it
+        looks at is recorded as a dependency.
+        """
         stack = LinkedStack()
         current = self
 
         while current:
+            if cached_on is not None:
+                _depend(current, cached_on)
+                if current.store is not None:
+                    _depend(current.store, cached_on)
+                if isinstance(current.store, TrailSplit):
+                    # The personality may look at the first store of either branch.
+                    for branch in (current.store.path_top, current.store.path_bottom):
+                        _depend(branch, cached_on)
+                        if branch.store is not None:
+                            _depend(branch.store, cached_on)
             if isinstance(current.store, TrailSeries):
                 personality.add_mountain(current.store.mountain)
                 current = current.store.following
@@ -102,23 +290,200 @@ class Trail:
                 else:
                     current = current.store.path_bottom
             if current.store is None:
+                if cached_on is not None:
+                    # An empty trail the walk went through, which may be filled in later.
+                    _depend(current, cached_on)
                 if stack.is_empty():
                     break
                 else:
                     current = stack.pop()
 
+    def _cache(self) -> dict:
+        """
+        Returns a dictionary for caching results about this trail, emptied when something
+        recorded with `_depend` for this trail changes.
+
+        It is kept outside of the dataclass fields, so it is never compared, printed or serialized.
+        """
+        cache = self.__dict__.get("_cached")
+        if cache is None:
+            cache = self.__dict__["_cached"] = {}
+        return cache
+
     def collect_all_mountains(self) -> list[Mountain]:
         """Returns a list of all mountains on the trail."""
-        if isinstance(self.store, TrailSeries):
-            return [self.store.mountain] + self.store.following.collect_all_mountains()
-        elif isinstance(self.store, TrailSplit):
-            return (
-                    self.store.path_top.collect_all_mountains() +
-                    self.store.path_bottom.collect_all_mountains() +
-                    self.store.path_follow.collect_all_mountains()
+        return list(self.iter_mountains())
+
+    def iter_trails(self) -> Iterator[Trail]:
+        """
+        Yields this trail and every subtrail, parents before children.
+        Split children come in top, bottom, follow order.
+
+        Uses an explicit stack, so arbitrarily deep trails are fine.
+        :complexity: O(N) where N is the number of trail nodes.
+        """
+        stack = [self]
+        while stack:
+            current = stack.pop()
+            yield current
+            if isinstance(current.store, TrailSeries):
+                stack.append(current.store.following)
+            elif isinstance(current.store, TrailSplit):
+                stack.append(current.store.path_follow)
+                stack.append(current.store.path_bottom)
+                stack.append(current.store.path_top)
+
+    def iter_mountains(self) -> Iterator[Mountain]:
+        """Yields every mountain on the trail, in the same order as `collect_all_mountains`."""
+        for current in self.iter_trails():
+            if isinstance(current.store, TrailSeries):
+                yield current.store.mountain
+
+    def fold(
+        self,
+        empty: T,
+        series: Callable[[TrailSeries, T], T],
+        split: Callable[[TrailSplit, T, T, T], T],
+        cache_key: Hashable | None = None,
+    ) -> T:
+        """
+        Combines values bottom up over the trail, without recursion.
+
+        `empty` is the value of an empty trail, `series` is called with the series and the
+        value of its following trail, and `split` with the split and the values of its
+        top, bottom and follow trails.
+
+        If `cache_key` is given, the value of every subtrail is cached on it under that key
+        until it or one of its subtrails changes (see `trail_edited`), and subtrails with
+        a cached value are not walked again. Changes only drop the values of the changed
+        trail and the trails above it.
+
+        :complexity: O(N) calls to series/split where N is the number of trail nodes not already cached.
+        """
+        memo: dict[int, T] = {}
+        stack = [self]
+        while stack:
+            current = stack[-1]
+            if id(current) in memo:
+                stack.pop()
+                continue
+            if cache_key is not None:
+                cache = current._cache()
+                if cache_key in cache:
+                    memo[id(current)] = cache[cache_key]
+                    stack.pop()
+                    continue
+            store = current.store
+            if isinstance(store, TrailSeries):
+                if id(store.following) not in memo:
+                    stack.append(store.following)
+                    continue
+                value = series(store, memo[id(store.following)])
+            elif isinstance(store, TrailSplit):
+                children = (store.path_top, store.path_bottom, store.path_follow)
+                missing = [child for child in children if id(child) not in memo]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                value = split(store, *(memo[id(child)] for child in children))
+            else:
+                value = empty
+            memo[id(current)] = value
+            if cache_key is not None:
+                cache[cache_key] = value
+                # Changing this trail's store, or any of its subtrails, drops the value.
+                if store is not None:
+                    _depend(store, current)
+                    for child in _children(store):
+                        _depend(child, current)
+            stack.pop()
+        return memo[id(self)]
+
+    def structural_hash(self) -> bytes:
+        """
+        Returns a hash of the mountains and shape of this trail.
+
+        Each subtrail's hash combines its mountain and the hashes of its subtrails
+        (a Merkle tree), so equal trails have equal hashes, and different trails
+        have different ones barring a 128 bit collision. Used by `trail_diff`
+        to skip identical subtrails.
+        Hashes are cached on each subtrail until it changes, see `fold`.
+        :complexity: O(N) where N is the number of trail nodes not already cached.
+        """
+        return self.fold(
+            EMPTY_HASH,
+            lambda store, following: series_hash(store.mountain, following),
+            lambda store, top, bottom, follow: split_hash(top, bottom, follow),
+            "structural_hash",
+        )
+
+    def __eq__(self, other) -> bool:
+        """
+        Trails are equal when they have the same mountains (by name, difficulty level and length)
+        in the same shape. Compares node by node without recursion, so it is fine for arbitrarily
+        deep trails, and always sees the trails as they are now.
+
+        To compare many trails, or the same ones repeatedly, compare `structural_hash` instead.
+        :complexity: O(N) where N is the number of trail nodes, stopping at the first difference.
+        """
+        if not isinstance(other, Trail):
+            return NotImplemented
+        stack = [(self, other)]
+        while stack:
+            left, right = stack.pop()
+            if left is right:
+                continue
+            left_store, right_store = left.store, right.store
+            if isinstance(left_store, TrailSeries):
+                if not isinstance(right_store, TrailSeries):
+                    return False
+                left_mountain, right_mountain = left_store.mountain, right_store.mountain
+                if (left_mountain.name, left_mountain.difficulty_level, left_mountain.length) != \
+                        (right_mountain.name, right_mountain.difficulty_level, right_mountain.length):
+                    return False
+                stack.append((left_store.following, right_store.following))
+            elif isinstance(left_store, TrailSplit):
+                if not isinstance(right_store, TrailSplit):
+                    return False
+                stack.append((left_store.path_follow, right_store.path_follow))
+                stack.append((left_store.path_bottom, right_store.path_bottom))
+                stack.append((left_store.path_top, right_store.path_top))
+            elif right_store is not None:
+                return False
+        return True
+
+    def stats(self) -> TrailStats:
+        """
+        Returns totals over every mountain on this trail.
+
+        Results are cached on each subtrail until it changes (see `fold`), so asking again,
+        or asking about a subtrail afterwards, is O(1), and after an edit only the
+        edited trail and the trails above it are totalled again.
+        :complexity: O(N) where N is the number of trail nodes not already cached.
+        """
+        def series(store: TrailSeries, following: TrailStats) -> TrailStats:
+            difficulty = store.mountain.difficulty_level
+            return TrailStats(
+                mountain_count=following.mountain_count + 1,
+                total_length=following.total_length + store.mountain.length,
+                min_difficulty=difficulty if following.min_difficulty is None else min(difficulty, following.min_difficulty),
+                max_difficulty=difficulty if following.max_difficulty is None else max(difficulty, following.max_difficulty),
+                max_path_length=following.max_path_length + 1,
+            )
+
+        def split(store: TrailSplit, top: TrailStats, bottom: TrailStats, follow: TrailStats) -> TrailStats:
+            parts = (top, bottom, follow)
+            min_difficulties = [part.min_difficulty for part in parts if part.min_difficulty is not None]
+            max_difficulties = [part.max_difficulty for part in parts if part.max_difficulty is not None]
+            return TrailStats(
+                mountain_count=sum(part.mountain_count for part in parts),
+                total_length=sum(part.total_length for part in parts),
+                min_difficulty=min(min_difficulties, default=None),
+                max_difficulty=max(max_difficulties, default=None),
+                max_path_length=max(top.max_path_length, bottom.max_path_length) + follow.max_path_length,
             )
-        else:
-            return []
+
+        return self.fold(TrailStats(0, 0, None, None, 0), series, split, "stats")
 
     def length_k_paths(self, k) -> list[list[Mountain]]:  # Input to this should not exceed k > 50, at most 5 branches.
         """
@@ -127,13 +492,150 @@ class Trail:
 
         Paths are unique if they take a different branch, even if this results in the same set of mountains.
         """
-        if k == 0:
-            return [[]]
-        paths = []
-        if isinstance(self.store, TrailSplit):
-            paths += self.store.path_top.length_k_paths(k - 1)
-            paths += self.store.path_bottom.length_k_paths(k - 1)
-            paths += self.store.path_follow.length_k_paths(k - 1)
-        elif isinstance(self.store, TrailSeries):
-            paths += self.store.following.length_k_paths(k - 1)
-        return [[self.store.mountain] + p for p in paths]
+        return list(self.iter_k_paths(k))
+
+    def iter_k_paths(self, k: int) -> Iterator[list[Mountain]]:
+        """
+        Lazily yields every path containing exactly k mountains, in the same order as `length_k_paths`.
+
+        Only the current path and the untaken branches along it are kept,
+        so a caller that stops early never pays for the remaining paths.
+        Each yielded list is a fresh copy and may be kept or modified.
+        """
+        path: list[Mountain] = []
+        # Each entry is a branch still to explore: (trail, what follows it, path length so far).
+        # What follows a trail is a linked list of (trail, rest) pairs, shared between entries.
+        pending: list[tuple[Trail, tuple | None, int]] = [(self, None, 0)]
+        while pending:
+            current, after, depth = pending.pop()
+            del path[depth:]
+            while depth <= k:
+                store = current.store
+                if isinstance(store, TrailSeries):
+                    path.append(store.mountain)
+                    depth += 1
+                    current = store.following
+                elif isinstance(store, TrailSplit):
+                    after = (store.path_follow, after)
+                    pending.append((store.path_bottom, after, depth))
+                    current = store.path_top
+                elif after is not None:
+                    current, after = after
+                else:
+                    if depth == k:
+                        yield list(path)
+                    break
+
+    def count_k_paths(self, k: int) -> int:
+        """
+        Returns the number of paths containing exactly k mountains.
+
+        Counts the same paths as `length_k_paths`, but never builds them.
+        """
+        if k < 0:
+            return 0
+        counts = self._path_length_counts(k)
+        return counts[k] if k < len(counts) else 0
+
+    def path_length_distribution(self) -> dict[int, int]:
+        """
+        Returns a mapping from path length (in mountains) to the number of paths of that length.
+        """
+        counts = self._path_length_counts(None)
+        return {length: count for length, count in enumerate(counts) if count}
+
+    def _path_length_counts(self, limit: int | None) -> list[int]:
+        """
+        Returns a list where index i holds the number of paths with i mountains.
+        Lengths above `limit` are dropped, if a limit is given.
+
+        :complexity: O(N * L^2) where N is the number of trail nodes and L the longest path length.
+        """
+        def series(store: TrailSeries, follow: list[int]) -> list[int]:
+            counts = [0] + follow
+            return counts if limit is None else counts[:limit + 1]
+
+        def split(store: TrailSplit, top: list[int], bottom: list[int], follow: list[int]) -> list[int]:
+            branches = [0] * max(len(top), len(bottom))
+            for length, count in enumerate(top):
+                branches[length] += count
+            for length, count in enumerate(bottom):
+                branches[length] += count
+            # Every branch path can be joined to every following path.
+            counts = [0] * (len(branches) + len(follow) - 1)
+            for i, branch_count in enumerate(branches):
+                if branch_count:
+                    for j, follow_count in enumerate(follow):
+                        counts[i + j] += branch_count * follow_count
+            return counts if limit is None else counts[:limit + 1]
+
+        return self.fold([1], series, split)
+
+    def min_difficulty_path(self) -> list[Mountain]:
+        """Returns the path with the lowest total difficulty level."""
+        return self.k_best_paths(1, lambda mountain: mountain.difficulty_level)[0]
+
+    def longest_path(self) -> list[Mountain]:
+        """Returns the path with the greatest total mountain length."""
+        return self.k_best_paths(1, lambda mountain: -mountain.length)[0]
+
+    def k_best_paths(self, k: int, cost: Callable[[Mountain], float]) -> list[list[Mountain]]:
+        """
+        Returns the (at most) k paths with the lowest total cost, cheapest first.
+        The cost of a path is the sum of `cost` over its mountains.
+
+        Each subtrail keeps only its own k best partial paths, so no path outside of
+        the answer is ever built.
+        :complexity: O(N * k log k + M) where N is the number of trail nodes and M
+                     the number of calls to cost (one per mountain).
+        """
+        if k <= 0:
+            return []
+
+        # Candidates are sorted lists of (total cost, path) where a path is a tuple tree:
+        # (mountain, rest) adds a mountain to the front, (None, branch, follow) joins two paths.
+        def series(store: TrailSeries, following: list) -> list:
+            mountain_cost = cost(store.mountain)
+            return [(total + mountain_cost, (store.mountain, path)) for total, path in following]
+
+        def split(store: TrailSplit, top: list, bottom: list, follow: list) -> list:
+            branches = list(islice(heapq.merge(top, bottom, key=lambda candidate: candidate[0]), k))
+            return _k_smallest_joins(branches, follow, k)
+
+        return [_flatten_path(path) for _, path in self.fold([(0, ())], series, split)]
+
+
+def _k_smallest_joins(branches: list, follows: list, k: int) -> list:
+    """
+    Returns the k cheapest joins of a branch path followed by a following path,
+    given both candidate lists sorted by cost.
+
+    :complexity: O(k log k)
+    """
+    result = []
+    # Heap of (total cost, branch index, follow index), starting from the cheapest pair.
+    heap = [(branches[0][0] + follows[0][0], 0, 0)]
+    seen = {(0, 0)}
+    while heap and len(result) < k:
+        total, i, j = heapq.heappop(heap)
+        result.append((total, (None, branches[i][1], follows[j][1])))
+        for ni, nj in ((i + 1, j), (i, j + 1)):
+            if ni < len(branches) and nj < len(follows) and (ni, nj) not in seen:
+                seen.add((ni, nj))
+                heapq.heappush(heap, (branches[ni][0] + follows[nj][0], ni, nj))
+    return result
+
+
+def _flatten_path(path: tuple) -> list[Mountain]:
+    """Turns a path tuple tree built by `Trail.k_best_paths` into a list of mountains."""
+    result = []
+    stack = [path]
+    while stack:
+        node = stack.pop()
+        if len(node) == 2:
+            result.append(node[0])
+            stack.append(node[1])
+        elif len(node) == 3:
+            stack.append(node[2])
+            stack.append(node[1])
+    return result
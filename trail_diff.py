@@ -0,0 +1,68 @@
+"""
+Comparing trail revisions, and sharing their identical parts, using structural hashes (see `Trail.structural_hash`).
+
+Subtrails with equal hashes are identical, so they are skipped when diffing,
+and can be shared when saving.
+"""
+from __future__ import annotations
+
+from trail import EMPTY_HASH, Trail, TrailSeries, TrailSplit, series_hash, split_hash
+
+
+def diff(a: Trail, b: Trail) -> list[tuple[tuple[str, ...], Trail, Trail]]:
+    """
+    Returns where two trails differ, as (path, subtrail of a, subtrail of b),
+    with each path made of slot names from the root as in `VersionedTrail`.
+
+    A difference is a series whose mountain differs (its following trails are diffed further),
+    or two subtrails of different kinds (which aren't looked into). Identical subtrails are skipped
+    without being walked, so diffing similar revisions costs little more than their differences,
+    once their hashes are cached.
+
+    :complexity: O(D * depth) where D is the number of differences, plus hashing the trails.
+    """
+    differences = []
+    stack = [((), a, b)]
+    while stack:
+        path, left, right = stack.pop()
+        if left is right or left.structural_hash() == right.structural_hash():
+            continue
+        left_store, right_store = left.store, right.store
+        if isinstance(left_store, TrailSeries) and isinstance(right_store, TrailSeries):
+            left_mountain, right_mountain = left_store.mountain, right_store.mountain
+            if (left_mountain.name, left_mountain.difficulty_level, left_mountain.length) != \
+                    (right_mountain.name, right_mountain.difficulty_level, right_mountain.length):
+                differences.append((path, left, right))
+            stack.append((path + ("following",), left_store.following, right_store.following))
+        elif isinstance(left_store, TrailSplit) and isinstance(right_store, TrailSplit):
+            # Pushed in reverse, so differences come out top, bottom, follow.
+            for slot in ("path_follow", "path_bottom", "path_top"):
+                stack.append((path + (slot,), getattr(left_store, slot), getattr(right_store, slot)))
+        else:
+            differences.append((path, left, right))
+    return differences
+
+
+def deduplicate(trail: Trail) -> Trail:
+    """
+    Returns a copy of the trail where identical subtrails are one shared Trail,
+    making it a DAG that `dump_binary` stores each shared subtrail of once.
+
+    Editing a shared subtrail in place changes every use of it, so only
+    deduplicate trails that are saved or read, not edited.
+    :complexity: O(N) where N is the number of trail nodes.
+    """
+    shared: dict[bytes, Trail] = {}
+
+    def share(digest: bytes, store) -> tuple[bytes, Trail]:
+        if digest not in shared:
+            shared[digest] = Trail(store)
+        return digest, shared[digest]
+
+    def series(store: TrailSeries, following: tuple[bytes, Trail]) -> tuple[bytes, Trail]:
+        return share(series_hash(store.mountain, following[0]), TrailSeries(store.mountain, following[1]))
+
+    def split(store: TrailSplit, top, bottom, follow) -> tuple[bytes, Trail]:
+        return share(split_hash(top[0], bottom[0], follow[0]), TrailSplit(top[1], bottom[1], follow[1]))
+
+    return trail.fold(share(EMPTY_HASH, None), series, split)[1]
@@ -0,0 +1,195 @@
+"""
+Index from mountain names to where they sit in a trail, for editing trails by name.
+"""
+from __future__ import annotations
+
+from mountain import Mountain
+from trail import Trail, TrailSeries, TrailStore, _children
+
+
+class TrailIndex:
+    """
+    Maps each mountain name to the trails whose store is the series holding a mountain of that name.
+    Such a trail is the slot the series hangs from, so replacing its store edits the trail in place.
+
+    The index watches every trail and store in the trail, so it is kept up to date however
+    the trail is edited: through the index, by assigning a trail's store or a store's fields,
+    or by `trail_edited` after changing a mountain in place. Each change costs O(C), where C is
+    the number of trails it adds or removes. A trail can only be watched by one index at a time.
+
+    Where several mountains share a name, the one indexed first is used, and the others
+    are used in turn as it is removed or renamed.
+    Methods taking a name raise a KeyError when there is no mountain with that name.
+    """
+
+    def __init__(self, trail: Trail) -> None:
+        """
+        Index every mountain on the trail.
+
+        :complexity: O(N) where N is the number of trail nodes.
+        """
+        self.trail = trail
+        self.nodes: dict[int, Trail | TrailStore] = {}
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Index the whole trail again.
+
+        :complexity: O(N) where N is the number of trail nodes.
+        """
+        for node in list(self.nodes.values()):
+            self._unwatch(node)
+        # Watched trails and stores by id, which keeps them alive so that ids aren't reused.
+        self.nodes = {}
+        # The trail holding each watched store, by the store's id.
+        self.holders: dict[int, Trail] = {}
+        # The name each trail holding a series is indexed under, by the trail's id.
+        self.names: dict[int, str] = {}
+        self.owners: dict[str, list[Trail]] = {}
+        self._add([self.trail])
+
+    def _owner(self, name: str) -> Trail:
+        """Returns the trail holding the named mountain."""
+        return self.owners[name][0]
+
+    def __len__(self) -> int:
+        """Returns the number of mountains indexed."""
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.owners
+
+    def locate(self, name: str) -> Trail:
+        """Returns the trail whose store is the series holding the named mountain."""
+        return self._owner(name)
+
+    def __getitem__(self, name: str) -> Mountain:
+        """Returns the mountain with the given name."""
+        return self._owner(name).store.mountain
+
+    def add_mountain_before(self, name: str, mountain: Mountain) -> None:
+        """Adds a mountain just before the named one."""
+        owner = self._owner(name)
+        owner.store = owner.store.add_mountain_before(mountain)
+
+    def add_mountain_after(self, name: str, mountain: Mountain) -> None:
+        """Adds a mountain just after the named one."""
+        owner = self._owner(name)
+        owner.store = owner.store.add_mountain_after(mountain)
+
+    def add_empty_branch_before(self, name: str) -> None:
+        """Adds an empty branch just before the named mountain."""
+        owner = self._owner(name)
+        owner.store = owner.store.add_empty_branch_before()
+
+    def add_empty_branch_after(self, name: str) -> None:
+        """Adds an empty branch just after the named mountain."""
+        owner = self._owner(name)
+        owner.store = owner.store.add_empty_branch_after()
+
+    def remove(self, name: str) -> Mountain:
+        """Removes the named mountain from the trail, and returns it."""
+        owner = self._owner(name)
+        removed = owner.store.mountain
+        owner.store = owner.store.remove_mountain()
+        return removed
+
+    def replace(self, name: str, mountain: Mountain) -> None:
+        """Puts a different mountain in place of the named one."""
+        owner = self._owner(name)
+        owner.store = TrailSeries(mountain, owner.store.following)
+
+    def changed(self, node: Trail | TrailStore, name: str | None, old) -> None:
+        """
+        Called when a watched trail or store changes: `name` is the field that was assigned
+        and `old` its previous value, or `name` is None when a mountain was changed in place.
+
+        :complexity: O(C) where C is the number of trails added or removed.
+        """
+        trail = node if isinstance(node, Trail) else self.holders.get(id(node))
+        if name is None or name == "mountain":
+            if trail is not None:
+                self._unname(trail)
+                self._name(trail)
+        elif isinstance(node, Trail):
+            self._unname(node)
+            self._hold(node)
+            kept = self._add(_children(node.store))
+            if old is not node.store:
+                self._remove(self._release(node, old), kept)
+        else:
+            kept = self._add([getattr(node, name)])
+            self._remove([old], kept)
+
+    def _add(self, trails) -> set[int]:
+        """
+        Indexes the given trails and the trails under them, down to trails that are already indexed.
+        Returns the ids of those already indexed trails, which are kept.
+        """
+        kept = set()
+        stack = list(trails)
+        while stack:
+            trail = stack.pop()
+            if id(trail) in self.nodes:
+                kept.add(id(trail))
+                continue
+            self._watch(trail)
+            self._hold(trail)
+            stack.extend(_children(trail.store))
+        return kept
+
+    def _remove(self, trails, kept: set[int]) -> None:
+        """Drops the given trails, and the trails under them, from the index, apart from kept ones."""
+        stack = list(trails)
+        while stack:
+            trail = stack.pop()
+            if id(trail) in kept or id(trail) not in self.nodes:
+                continue
+            self._unname(trail)
+            self._unwatch(trail)
+            stack.extend(self._release(trail, trail.store))
+
+    def _hold(self, trail: Trail) -> None:
+        """Indexes the store of a watched trail."""
+        store = trail.store
+        if store is not None:
+            self._watch(store)
+            self.holders[id(store)] = trail
+        self._name(trail)
+
+    def _release(self, trail: Trail, store: TrailStore) -> tuple[Trail, ...]:
+        """
+        Stops indexing a store the trail held, unless another trail holds it now,
+        and returns the subtrails that were under it.
+        """
+        if store is None or self.holders.get(id(store)) is not trail:
+            return ()
+        del self.holders[id(store)]
+        self._unwatch(store)
+        return _children(store)
+
+    def _name(self, trail: Trail) -> None:
+        if isinstance(trail.store, TrailSeries):
+            name = trail.store.mountain.name
+            self.names[id(trail)] = name
+            self.owners.setdefault(name, []).append(trail)
+
+    def _unname(self, trail: Trail) -> None:
+        name = self.names.pop(id(trail), None)
+        if name is None:
+            return
+        owners = self.owners[name]
+        # By identity, since equal trails may hold different mountains of the same name.
+        del owners[next(i for i, owner in enumerate(owners) if owner is trail)]
+        if not owners:
+            del self.owners[name]
+
+    def _watch(self, node: Trail | TrailStore) -> None:
+        self.nodes[id(node)] = node
+        node.__dict__["_watcher"] = self
+
+    def _unwatch(self, node: Trail | TrailStore) -> None:
+        self.nodes.pop(id(node), None)
+        if node.__dict__.get("_watcher") is self:
+            del node.__dict__["_watcher"]
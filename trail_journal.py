@@ -0,0 +1,251 @@
+"""
+Journaled trail stores.
+
+Instead of rewriting the whole store on every save, each edit is appended to a
+journal next to the store as one JSON line. Loading reads the store (the snapshot)
+and replays the journal on top of it. Compaction folds the journal back into the
+snapshot, in a background thread.
+
+    stores/basic.json          The snapshot, with a "journal_seq" key for the last edit it includes.
+    stores/basic.json.journal  {"seq": 4, "path": ["following"], "op": "add_mountain_after", "mountain": {...}}
+
+Each record's path is the slot names from the root to the edited subtrail, as in `VersionedTrail`.
+"""
+from __future__ import annotations
+from dataclasses import asdict
+import json
+import os
+import threading
+from typing import Sequence
+
+from mountain import Mountain
+from serialize import dump, load, open_store
+from trail import Trail, TrailSeries, trail_edited
+
+JOURNAL_SUFFIX = ".journal"
+
+# Edits `TrailDraw.box_and_action` can make, plus "edit" for changing a mountain in place.
+OPS = frozenset({
+    "add_mountain_before", "add_mountain_after",
+    "add_empty_branch_before", "add_empty_branch_after",
+    "remove_mountain", "remove_branch", "edit",
+})
+
+
+def apply_edit(trail: Trail, path: Sequence[str], op: str, mountain: Mountain | None = None) -> Trail:
+    """
+    Makes one edit to the trail in place, the same way `TrailDraw.box_and_action` does,
+    and returns the root, which is only a new trail when an empty root was edited.
+
+    :raises ValueError: when the path or edit doesn't fit the trail.
+    :complexity: O(len(path)) plus the cost of the edit.
+    """
+    if op not in OPS:
+        raise ValueError(f"Unknown trail edit {op!r}")
+    parent, slot, target = None, None, trail
+    for slot in path:
+        if not hasattr(target.store, slot):
+            raise ValueError(f"No {slot} in {target.store.__class__.__name__}")
+        parent, target = target.store, getattr(target.store, slot)
+    args = () if mountain is None else (mountain,)
+
+    if op == "edit":
+        if not isinstance(target.store, TrailSeries) or mountain is None:
+            raise ValueError("Only the mountain of a series can be edited")
+        target.store.mountain.name = mountain.name
+        target.store.mountain.difficulty_level = mountain.difficulty_level
+        target.store.mountain.length = mountain.length
+        trail_edited(target)
+    elif hasattr(target.store, op):
+        target.store = getattr(target.store, op)(*args)
+    elif hasattr(target, op):
+        # Edits of an empty trail replace the trail itself.
+        new_trail = getattr(target, op)(*args)
+        if parent is None:
+            return new_trail
+        setattr(parent, slot, new_trail)
+    else:
+        raise ValueError(f"Can't {op} on {target.store.__class__.__name__}")
+    return trail
+
+
+class TrailJournal:
+    """
+    A trail store with an append only journal of edits.
+
+    `record` appends an edit (it matches the `on_edit` callback of `TrailDraw`),
+    `save` makes sure the appended edits are on disk, and `compact` rewrites the
+    snapshot in the background. A crash at any point loses at most the edits
+    that weren't saved yet, and a half written last record is ignored.
+    """
+
+    def __init__(self, path: str, compact_after: int = 1000) -> None:
+        """
+        Journal for the store at `path`. Call `load` before recording edits.
+        `save` starts a compaction once the journal holds `compact_after` records.
+        """
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_after = compact_after
+        self.seq = 0
+        self.pending = 0
+        self.file = None
+        self.compaction: threading.Thread | None = None
+        # Guards the journal file, `seq` and `pending` between edits and compaction.
+        self.lock = threading.Lock()
+
+    def load(self) -> Trail:
+        """
+        Reads the snapshot, replays the journal on top of it, and opens the journal for new records.
+        A missing snapshot is an empty trail.
+
+        :raises ValueError: when the snapshot or a journal record (other than a torn last one) is unreadable.
+        :complexity: O(S + J) where S is the size of the snapshot and J the size of the journal.
+        """
+        trail, snapshot_seq = self._read_snapshot()
+        records, good_size = self._read_records()
+        trail, self.seq = self._replay(trail, snapshot_seq, records)
+        self.pending = len(records)
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > good_size:
+            # Drop a record that was cut off part way, so new records start on a line of their own.
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good_size)
+        self.file = open(self.journal_path, "a", encoding="utf-8")
+        return trail
+
+    def record(self, path: Sequence[str], op: str, args: tuple = ()) -> None:
+        """
+        Appends one edit to the journal, where `args` is empty or holds the edit's mountain.
+        The mountain is written straight away, so later changes to it need their own "edit" record.
+
+        :complexity: O(len(path))
+        """
+        if op not in OPS:
+            raise ValueError(f"Unknown trail edit {op!r}")
+        entry = {"seq": 0, "path": list(path), "op": op}
+        if args:
+            entry["mountain"] = asdict(args[0])
+        with self.lock:
+            self.seq += 1
+            entry["seq"] = self.seq
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            self.pending += 1
+
+    def save(self, background: bool = True) -> None:
+        """
+        Makes sure every recorded edit is on disk, compacting (see `compact`) if the journal is long.
+
+        :complexity: O(1), apart from waiting on the disk, or O(S + J) if it compacts without `background`.
+        """
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            pending = self.pending
+        if pending >= self.compact_after:
+            self.compact(background)
+
+    def compact(self, background: bool = True) -> threading.Thread | None:
+        """
+        Writes a new snapshot with every edit recorded so far, then drops those edits from the journal.
+        With `background`, this happens in a thread (which is returned) while edits keep being recorded.
+
+        :complexity: O(S + J), see `load`.
+        """
+        if self.compaction is not None and self.compaction.is_alive():
+            return self.compaction
+        if not background:
+            self._compact()
+            return None
+        self.compaction = threading.Thread(target=self._compact, name="trail-journal-compaction")
+        self.compaction.start()
+        return self.compaction
+
+    def close(self) -> None:
+        """Waits for any compaction, saves (compacting before it returns if the journal is long), and closes the journal."""
+        if self.compaction is not None:
+            self.compaction.join()
+        if self.file is not None:
+            self.save(background=False)
+            self.file.close()
+            self.file = None
+
+    def _compact(self) -> None:
+        with self.lock:
+            self.file.flush()
+            upto = self.seq
+        # The snapshot is rebuilt from disk, so the trail being edited is never touched here.
+        trail, snapshot_seq = self._read_snapshot()
+        records, _ = self._read_records(upto)
+        trail, seq = self._replay(trail, snapshot_seq, records)
+        self._write_atomic(self.path, lambda f: dump(trail, f, extra={"journal_seq": seq}))
+        # A crash from here on only leaves records in the journal that the snapshot already has.
+        with self.lock:
+            self.file.close()
+            kept = [line for seq, line in self._read_records()[0] if seq > upto]
+            self._write_atomic(self.journal_path, lambda f: f.writelines(kept))
+            self.file = open(self.journal_path, "a", encoding="utf-8")
+            self.pending = len(kept)
+
+    def _read_snapshot(self) -> tuple[Trail, int]:
+        extra = {}
+        try:
+            with open_store(self.path, "r") as f:
+                trail = load(f, extra=extra)
+        except FileNotFoundError:
+            return Trail(None), 0
+        return trail, extra.get("journal_seq", 0)
+
+    def _read_records(self, upto: int | None = None) -> tuple[list[tuple[int, str]], int]:
+        """
+        Returns the (seq, line) of each journal record, up to seq `upto` if given,
+        and the size in bytes of the part of the journal that was read.
+        """
+        records = []
+        size = 0
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return records, size
+        for i, raw in enumerate(lines):
+            try:
+                if not raw.endswith(b"\n"):
+                    raise ValueError("Record is cut off")
+                line = raw.decode("utf-8")
+                seq = json.loads(line)["seq"]
+            except (ValueError, KeyError, TypeError):
+                if i == len(lines) - 1:
+                    # Torn by a crash while it was written.
+                    break
+                raise ValueError(f"Corrupt record on line {i + 1} of {self.journal_path}")
+            if upto is not None and seq > upto:
+                break
+            records.append((seq, line))
+            size += len(raw)
+        return records, size
+
+    @staticmethod
+    def _replay(trail: Trail, snapshot_seq: int, records: list[tuple[int, str]]) -> tuple[Trail, int]:
+        """Applies the records the snapshot doesn't have yet, returning the trail and the last seq."""
+        seq = snapshot_seq
+        for record_seq, line in records:
+            if record_seq <= seq:
+                continue
+            entry = json.loads(line)
+            mountain = Mountain(**entry["mountain"]) if "mountain" in entry else None
+            trail = apply_edit(trail, entry["path"], entry["op"], mountain)
+            seq = record_seq
+        return trail, seq
+
+    @staticmethod
+    def _write_atomic(path: str, write) -> None:
+        """Writes a file through a temporary one, so a crash leaves either the old or the new file."""
+        # Keep the extension, which decides the compression.
+        base, extension = os.path.splitext(path)
+        temp_path = base + ".tmp" + extension
+        with open_store(temp_path, "w") as f:
+            write(f)
+        with open(temp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
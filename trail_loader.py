@@ -0,0 +1,139 @@
+"""
+Loading trail stores through a cache, for tools that open the same stores many times.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import os
+import threading
+
+from binary_store import EXTENSION as BINARY_EXTENSION, load_binary
+from serialize import COMPRESSED_EXTENSIONS, load, open_store
+from trail import Trail
+
+STORE_EXTENSIONS = (".json", BINARY_EXTENSION, *(".json" + extension for extension in COMPRESSED_EXTENSIONS))
+
+
+class _CountingReader:
+    """Wraps a text file, counting the characters read through it."""
+
+    def __init__(self, f) -> None:
+        self.f = f
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        data = self.f.read(size)
+        self.count += len(data)
+        return data
+
+
+class TrailLoader:
+    """
+    Loads trail stores, keeping recently used trails parsed.
+
+    A cached trail is used again while its file is unchanged: same modification
+    time and size, or with `hash_contents`, the same SHA-256 of its contents.
+    The cache is least recently used first out, and is bounded by the total size
+    of the JSON (uncompressed) or binary stores it holds, which parsed trails grow
+    in proportion to.
+
+    Loaded trails are shared between callers, so treat them as read only.
+    JSON stores (compressed too, see `open_store`) and binary (.trlb) stores can be loaded.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, hash_contents: bool = False) -> None:
+        self.max_bytes = max_bytes
+        self.hash_contents = hash_contents
+        # Absolute path -> (signature, trail, size), least recently used first.
+        self.cache: OrderedDict[str, tuple[tuple, Trail, int]] = OrderedDict()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Returns the number of trails cached."""
+        return len(self.cache)
+
+    def load(self, path: str) -> Trail:
+        """
+        Returns the trail in the given store, parsing it only if it isn't cached or has changed.
+
+        :raises OSError: when the file can't be read.
+        :raises ValueError: when the file isn't a trail store.
+        :complexity: O(1) for a cached trail (O(S) with `hash_contents`), otherwise O(S),
+            where S is the size of the file.
+        """
+        path = os.path.abspath(path)
+        data = None
+        if self.hash_contents:
+            with open(path, "rb") as f:
+                data = f.read()
+            signature = (hashlib.sha256(data).hexdigest(),)
+            size = len(data)
+        else:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.cache.get(path)
+            if entry is not None and entry[0] == signature:
+                self.cache.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        trail, size = self._parse(path, data)
+        with self.lock:
+            self._store(path, (signature, trail, size))
+        return trail
+
+    def _parse(self, path: str, data: bytes | None) -> tuple[Trail, int]:
+        """
+        Returns the trail in a store and the size to charge it to the cache:
+        the size of its JSON after any decompression, or of the binary store.
+        """
+        if path.endswith(BINARY_EXTENSION):
+            return load_binary(path), os.path.getsize(path)
+        if data is not None and os.path.splitext(path)[1] not in COMPRESSED_EXTENSIONS:
+            return load(io.StringIO(data.decode("utf-8"))), len(data)
+        with open_store(path, "r") as f:
+            reader = _CountingReader(f)
+            return load(reader), reader.count
+
+    def _store(self, path: str, entry: tuple[tuple, Trail, int]) -> None:
+        """Caches a trail, evicting the least recently used ones to fit. Call with the lock held."""
+        old = self.cache.pop(path, None)
+        if old is not None:
+            self.cached_bytes -= old[2]
+        if entry[2] > self.max_bytes:
+            return
+        self.cache[path] = entry
+        self.cached_bytes += entry[2]
+        while self.cached_bytes > self.max_bytes:
+            _, (_, _, size) = self.cache.popitem(last=False)
+            self.cached_bytes -= size
+
+    def load_all(self, stores_dir: str, workers: int | None = None) -> dict[str, Trail]:
+        """
+        Loads every JSON (compressed or not) and binary store in the directory on a thread pool,
+        returning the trails by file name.
+
+        :raises OSError: when a file can't be read.
+        :raises ValueError: when a file isn't a trail store.
+        """
+        names = sorted(
+            name for name in os.listdir(stores_dir)
+            if name.endswith(STORE_EXTENSIONS) and os.path.isfile(os.path.join(stores_dir, name))
+        )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            trails = executor.map(self.load, (os.path.join(stores_dir, name) for name in names))
+            return dict(zip(names, trails))
+
+    def clear(self) -> None:
+        """Drops every cached trail."""
+        with self.lock:
+            self.cache.clear()
+            self.cached_bytes = 0
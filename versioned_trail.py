@@ -0,0 +1,128 @@
+"""
+Trail with undo/redo, where every edit makes a new version that shares
+all unchanged subtrails with the previous one.
+"""
+from __future__ import annotations
+from dataclasses import replace
+from typing import Sequence
+
+from data_structures.linked_stack import LinkedStack
+from mountain import Mountain
+from trail import Trail, TrailSeries
+
+
+class VersionedTrail:
+    """
+    Keeps a history of trail versions.
+
+    Versions are never changed in place. An edit copies only the trails on the
+    path from the root down to the edited subtrail (path copying), so each new
+    version costs O(depth) and any old root stays a valid snapshot.
+
+    Subtrails are addressed by a path of slot names from the root, each one of
+    "following", "path_top", "path_bottom" or "path_follow".
+    Mountains are shared between versions, so change them with `replace_mountain`
+    rather than in place.
+    """
+
+    SLOTS = ("following", "path_top", "path_bottom", "path_follow")
+
+    def __init__(self, trail: Trail | None = None) -> None:
+        self.current = trail if trail is not None else Trail(None)
+        self.undo_stack: LinkedStack[Trail] = LinkedStack()
+        self.redo_stack: LinkedStack[Trail] = LinkedStack()
+
+    @property
+    def trail(self) -> Trail:
+        """The current version. Treat it as read only, edit through this class instead."""
+        return self.current
+
+    def subtrail(self, path: Sequence[str]) -> Trail:
+        """
+        Returns the subtrail at the given path in the current version.
+
+        :raises KeyError: when a slot in the path doesn't exist at that point.
+        :complexity: O(len(path))
+        """
+        return self._spine(path)[-1]
+
+    def _spine(self, path: Sequence[str]) -> list[Trail]:
+        """Returns every trail from the root down to the one at the given path."""
+        spine = [self.current]
+        for slot in path:
+            store = spine[-1].store
+            if slot not in self.SLOTS or not hasattr(store, slot):
+                raise KeyError(f"No {slot} in {store.__class__.__name__}")
+            spine.append(getattr(store, slot))
+        return spine
+
+    def edit(self, path: Sequence[str], method: str, *args) -> Trail:
+        """
+        Makes a new version by calling an edit method on the subtrail at the given path,
+        such as edit(["following"], "add_mountain_after", mountain).
+
+        The method is looked up on the subtrail's store (TrailSeries or TrailSplit),
+        or on the Trail itself if the store has no such method (or it is empty).
+        Clears the redo history, and returns the new version.
+
+        :raises KeyError: when the path doesn't exist.
+        :raises AttributeError: when neither the store nor the trail has such a method.
+        :complexity: O(len(path)) plus the cost of the method.
+        """
+        spine = self._spine(path)
+        target = spine[-1]
+        if hasattr(target.store, method):
+            new_trail = Trail(getattr(target.store, method)(*args))
+        else:
+            new_trail = getattr(target, method)(*args)
+        return self._commit(spine, path, new_trail)
+
+    def replace_mountain(self, path: Sequence[str], mountain: Mountain) -> Trail:
+        """
+        Makes a new version where the series at the given path has a different mountain.
+
+        :raises KeyError: when the path doesn't exist.
+        :raises TypeError: when the subtrail at the path isn't a series.
+        """
+        spine = self._spine(path)
+        store = spine[-1].store
+        if not isinstance(store, TrailSeries):
+            raise TypeError("Only a series has a mountain to replace.")
+        return self._commit(spine, path, Trail(replace(store, mountain=mountain)))
+
+    def _commit(self, spine: list[Trail], path: Sequence[str], new_trail: Trail) -> Trail:
+        """Copies the trails above the edited one, and makes the result the current version."""
+        for parent, slot in zip(reversed(spine[:-1]), reversed(path)):
+            new_trail = Trail(replace(parent.store, **{slot: new_trail}))
+        self.undo_stack.push(self.current)
+        self.redo_stack.clear()
+        self.current = new_trail
+        return new_trail
+
+    def can_undo(self) -> bool:
+        return not self.undo_stack.is_empty()
+
+    def can_redo(self) -> bool:
+        return not self.redo_stack.is_empty()
+
+    def undo(self) -> Trail:
+        """
+        Goes back to the previous version, and returns it.
+
+        :raises Exception: when there is nothing to undo.
+        """
+        previous = self.undo_stack.pop()
+        self.redo_stack.push(self.current)
+        self.current = previous
+        return previous
+
+    def redo(self) -> Trail:
+        """
+        Goes forward to the version that was last undone, and returns it.
+
+        :raises Exception: when there is nothing to redo.
+        """
+        following = self.redo_stack.pop()
+        self.undo_stack.push(self.current)
+        self.current = following
+        return following